@@ -0,0 +1,50 @@
+"""
+Models for the feincmstools benchmarks. Not part of the feincmstools package.
+"""
+
+from django.db import models
+
+from feincmstools.base import HierarchicalFeinCMSDocument, Content
+from feincmstools.mixins import HierarchicalSlug
+
+#: Names of the generated content types. Each has its own render template,
+#: except the ``Fancy*`` subclasses, which are resolved through their bases.
+CONTENT_TYPE_NAMES = ['Text', 'Quote', 'Image', 'Video', 'Embed', 'File']
+
+
+def _make_content_type(name, bases=(Content,)):
+    attrs = {
+        '__module__': __name__,
+        'Meta': type('Meta', (), {'abstract': True}),
+    }
+    if bases == (Content,):
+        attrs['text'] = models.TextField(blank=True)
+    return type(name, bases, attrs)
+
+CONTENT_TYPES = [_make_content_type(name) for name in CONTENT_TYPE_NAMES]
+CONTENT_TYPES += [_make_content_type('Fancy%s' % base.__name__, (base,))
+                  for base in CONTENT_TYPES]
+
+for _content_type in CONTENT_TYPES:
+    globals()[_content_type.__name__] = _content_type
+
+
+class Page(HierarchicalFeinCMSDocument, HierarchicalSlug):
+    title = models.CharField(max_length=255)
+    slug = models.SlugField(max_length=255, db_index=True)
+
+    feincms_templates = [{
+        'key': 'base',
+        'title': 'Base',
+        'path': 'base.html',
+        'regions': (
+            ('main', 'Main'),
+            ('aside', 'Aside'),
+            ('footer', 'Footer'),
+            ('sidebar', 'Sidebar', 'inherited'),
+        ),
+    }]
+
+    @classmethod
+    def content_types_by_region(cls, region):
+        return [(None, CONTENT_TYPES)]
@@ -0,0 +1,425 @@
+#!/usr/bin/env python
+"""
+Benchmarks for the feincmstools hot paths.
+
+Runs against a throwaway SQLite database filled with generated fixtures and
+writes the results as JSON, so that runs can be compared across releases:
+
+    python benchmarks/run.py --output before.json
+    ... upgrade or change feincmstools ...
+    python benchmarks/run.py --output after.json --compare before.json
+
+Use ``--profile full`` for larger fixtures, including repairing trees of 10k,
+100k and 1M nodes (slow), or ``--only`` to run some of the benchmarks, e.g.
+``--only render,get_path``.
+"""
+
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import timeit
+from optparse import OptionParser
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [HERE, os.path.dirname(HERE)]
+
+#: Fixture sizes per profile.
+PROFILES = {
+    'quick': {
+        'items_per_region': 10,
+        'tree_depth': 20,
+        'subtree_fanout': 5,
+        'subtree_depth': 3,
+        'repair_sizes': [1000],
+        'repeat': 5,
+    },
+    'full': {
+        'items_per_region': 50,
+        'tree_depth': 100,
+        'subtree_fanout': 10,
+        'subtree_depth': 3,
+        'repair_sizes': [10000, 100000, 1000000],
+        'repeat': 5,
+    },
+}
+
+
+def configure(database):
+    from django.conf import settings
+    settings.configure(
+        DEBUG=False,
+        SECRET_KEY='feincmstools-benchmarks',
+        DATABASES={'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': database,
+        }},
+        INSTALLED_APPS=[
+            'django.contrib.contenttypes',
+            'django.contrib.auth',
+            'mptt',
+            'feincms',
+            'feincmstools',
+            'benchapp',
+        ],
+        TEMPLATE_DIRS=[],
+        TEMPLATE_CONTEXT_PROCESSORS=[
+            'django.core.context_processors.request',
+        ],
+        TEMPLATE_LOADERS=[
+            ('django.template.loaders.cached.Loader', [
+                'django.template.loaders.app_directories.Loader',
+            ]),
+        ],
+        MIDDLEWARE_CLASSES=[],
+    )
+    import django
+    if hasattr(django, 'setup'):
+        django.setup()
+    from django.core.management import call_command
+    try:
+        call_command('migrate', run_syncdb=True, interactive=False, verbosity=0)
+    except TypeError:
+        call_command('syncdb', interactive=False, verbosity=0)
+
+
+# --- Fixtures -----------------------------------------------------------------
+
+class Ids(object):
+    """ Hands out primary keys, so that trees can be bulk created. """
+
+    def __init__(self, model):
+        last = model._base_manager.order_by('-pk').values_list('pk', flat=True)[:1]
+        self.next = (last[0] if last else 0) + 1
+
+    def __call__(self):
+        self.next += 1
+        return self.next - 1
+
+
+def build_tree(model, fanout, depth, tree_id, slug='node'):
+    """
+    Bulk creates a complete tree with valid MPTT fields, ``fanout`` children
+    per node, and returns its root.
+    """
+    ids = Ids(model)
+    nodes = []
+    counter = [0]
+
+    def add(parent, level, slug):
+        counter[0] += 1
+        node = model(pk=ids(), parent_id=parent and parent.pk, title=slug,
+                     slug=slug, template_key='base', tree_id=tree_id,
+                     level=level, lft=counter[0], rght=0)
+        nodes.append(node)
+        if level < depth:
+            for i in range(fanout):
+                add(node, level + 1, '%s-%d' % (slug, i))
+        counter[0] += 1
+        node.rght = counter[0]
+        return node
+
+    root = add(None, 0, slug)
+    model.objects.bulk_create(nodes, batch_size=500)
+    return model.objects.get(pk=root.pk)
+
+
+def build_corrupt_tree(model, size, tree_id):
+    """
+    Bulk creates ``size`` nodes with valid parents and preorder ``lft``
+    values, but without ``rght``/``level`` values, for ``repair_tree``.
+    """
+    ids = Ids(model)
+    nodes = []
+    parents = [None]
+    for i in range(size):
+        parent = parents[i // 10]
+        node = model(pk=ids(), parent_id=parent, title='r%d' % i, slug='r%d' % i,
+                     template_key='base', tree_id=tree_id, level=0,
+                     lft=i + 1, rght=0)
+        nodes.append(node)
+        parents.append(node.pk)
+    model.objects.bulk_create(nodes, batch_size=500)
+    return nodes
+
+
+def add_content(page, items_per_region):
+    from benchapp.models import Page, CONTENT_TYPES
+    for region in ('main', 'aside', 'footer', 'sidebar'):
+        by_type = {}
+        for i in range(items_per_region):
+            content_type = Page.content_type_for(
+                CONTENT_TYPES[i % len(CONTENT_TYPES)])
+            by_type.setdefault(content_type, []).append(content_type(
+                parent=page, region=region, ordering=i,
+                text='Item %d in %s.\n\nSecond paragraph.' % (i, region)))
+        for content_type, contents in by_type.items():
+            content_type.objects.bulk_create(contents)
+
+
+# --- Benchmarks ---------------------------------------------------------------
+
+def measure(fn, repeat, number=1):
+    """ Returns per-call timings in seconds, one for each repeat. """
+    timer = timeit.Timer(fn, timer=timeit.default_timer)
+    return [t / number for t in timer.repeat(repeat=repeat, number=number)]
+
+
+def clear_template_path_cache():
+    from feincmstools import base
+    base._template_path_cache.clear()
+
+
+def bench_content_init(options):
+    from benchapp.models import Page, CONTENT_TYPES
+    content_types = [Page.content_type_for(t) for t in CONTENT_TYPES]
+
+    def run():
+        for content_type in content_types:
+            for i in range(100):
+                content_type(region='main', ordering=i, text='text')
+    yield 'content_init', {'instances': 100 * len(content_types)}, \
+        measure(run, options['repeat'])
+
+
+def bench_render(options, page):
+    from django.template import Template, RequestContext
+    from django.test import RequestFactory
+    from benchapp.models import Page
+    template = Template(
+        '{% load feincms_tags %}'
+        '{% for region in regions %}'
+        '{% feincms_render_region page region request %}'
+        '{% endfor %}')
+    request = RequestFactory().get('/')
+    regions = ['main', 'aside', 'footer', 'sidebar']
+
+    values_template = Template(
+        '{% load feincmstools_tags %}'
+        '{% for region in regions %}'
+        '{% feincms_render_region_values page region request %}'
+        '{% endfor %}')
+    params = {
+        'regions': len(regions),
+        'items': len(regions) * options['items_per_region'],
+    }
+
+    def run(template=template):
+        context = RequestContext(request, {
+            'page': Page.objects.get(pk=page.pk), 'regions': regions})
+        template.render(context)
+    yield 'render', params, measure(run, options['repeat'])
+    yield 'render_values', params, \
+        measure(lambda: run(values_template), options['repeat'])
+
+
+def bench_template_resolution(options, page):
+    from benchapp.models import Page, CONTENT_TYPES
+    # The Fancy* subclasses have no templates of their own.
+    contents = [Page.content_type_for(t)(region='main')
+                for t in CONTENT_TYPES if t.__name__.startswith('Fancy')]
+
+    def run():
+        clear_template_path_cache()
+        for content in contents:
+            content._find_render_template_path('main')
+    yield 'template_resolution', {'content_types': len(contents)}, \
+        measure(run, options['repeat'])
+
+
+def bench_search_text(options, page):
+    from benchapp.models import Page
+
+    def run():
+        Page.objects.get(pk=page.pk).search_text()
+    yield 'search_text', {'items': options['items_per_region']}, \
+        measure(run, options['repeat'])
+
+
+def bench_region_has_content(options, page):
+    from benchapp.models import Page
+
+    def run():
+        document = Page.objects.get(pk=page.pk)
+        for region in ('main', 'aside', 'footer', 'sidebar', 'missing'):
+            document.region_has_content(region)
+    yield 'region_has_content', {'regions': 5}, measure(run, options['repeat'])
+
+
+def bench_get_path(options):
+    from benchapp.models import Page
+    depth = options['tree_depth']
+    leaf = build_tree(Page, 1, depth, tree_id=next_tree_id(), slug='deep')
+    leaf = Page.objects.get(tree_id=leaf.tree_id, level=depth)
+
+    def run():
+        Page.objects.get(pk=leaf.pk).get_path()
+    yield 'get_path', {'depth': depth}, measure(run, options['repeat'])
+
+
+def bench_inherited_region(options):
+    from benchapp.models import Page
+    depth = options['tree_depth']
+    root = build_tree(Page, 1, depth, tree_id=next_tree_id(), slug='inherit')
+    add_content(root, options['items_per_region'])
+    leaf = Page.objects.get(tree_id=root.tree_id, level=depth)
+
+    def run():
+        Page.objects.get(pk=leaf.pk).content.sidebar
+    yield 'inherited_region', {'depth': depth}, measure(run, options['repeat'])
+
+
+def bench_iter_paths(options):
+    from benchapp.models import Page
+    from feincmstools.sitemaps import iter_paths
+    fanout, depth = options['subtree_fanout'], options['subtree_depth']
+    root = build_tree(Page, fanout, depth, tree_id=next_tree_id(), slug='paths')
+    queryset = Page.objects.filter(tree_id=root.tree_id)
+    size = sum(fanout ** level for level in range(depth + 1))
+
+    def run():
+        for path, values in iter_paths(Page, queryset):
+            pass
+    yield 'iter_paths', {'nodes': size}, measure(run, options['repeat'])
+
+
+def bench_hierarchical_slug_save(options):
+    from benchapp.models import Page
+    fanout, depth = options['subtree_fanout'], options['subtree_depth']
+    root = build_tree(Page, fanout, depth, tree_id=next_tree_id(), slug='slug')
+    size = sum(fanout ** level for level in range(depth + 1))
+    slugs = iter(xrange(sys.maxint))
+
+    def run():
+        node = Page.objects.get(pk=root.pk)
+        node.slug = 'slug%d' % next(slugs)
+        node.save()
+    yield 'hierarchical_slug_save', {'nodes': size}, \
+        measure(run, options['repeat'])
+
+
+def bench_repair_tree(options):
+    from django.core.management import call_command
+    from benchapp.models import Page
+    for size in options['repair_sizes']:
+        Page.objects.all().delete()
+        build_corrupt_tree(Page, size, tree_id=1)
+        start = timeit.default_timer()
+        call_command('repair_tree', 'benchapp.Page')
+        # Large trees are too slow to repeat.
+        yield 'repair_tree', {'nodes': size}, [timeit.default_timer() - start]
+
+
+def next_tree_id():
+    from benchapp.models import Page
+    last = Page._base_manager.order_by('-tree_id').values_list(
+        'tree_id', flat=True)[:1]
+    return (last[0] if last else 0) + 1
+
+
+def run_benchmarks(options, only=None):
+    from benchapp.models import Page
+    page = build_tree(Page, 0, 0, tree_id=next_tree_id(), slug='page')
+    add_content(page, options['items_per_region'])
+
+    benchmarks = [
+        ('content_init', lambda: bench_content_init(options)),
+        ('render', lambda: bench_render(options, page)),
+        ('template_resolution', lambda: bench_template_resolution(options, page)),
+        ('search_text', lambda: bench_search_text(options, page)),
+        ('region_has_content', lambda: bench_region_has_content(options, page)),
+        ('get_path', lambda: bench_get_path(options)),
+        ('inherited_region', lambda: bench_inherited_region(options)),
+        ('iter_paths', lambda: bench_iter_paths(options)),
+        ('hierarchical_slug_save', lambda: bench_hierarchical_slug_save(options)),
+        # Deletes everything, so must run last.
+        ('repair_tree', lambda: bench_repair_tree(options)),
+    ]
+    results = []
+    for name, benchmark in benchmarks:
+        if only and name not in only:
+            continue
+        for result_name, params, timings in benchmark():
+            timings = sorted(timings)
+            result = {
+                'name': result_name,
+                'params': params,
+                'repeat': len(timings),
+                'min': timings[0],
+                'median': timings[len(timings) // 2],
+                'mean': sum(timings) / len(timings),
+            }
+            print '%-24s %-36s min %9.3fms  median %9.3fms' % (
+                result_name, json.dumps(params, sort_keys=True),
+                result['min'] * 1000, result['median'] * 1000)
+            results.append(result)
+    return results
+
+
+def environment():
+    import django
+    import feincms
+    return {
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'feincms': getattr(feincms, '__version__', None),
+        'platform': platform.platform(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+    }
+
+
+def compare(results, baseline_file):
+    """ Prints the change in median time relative to a previous run. """
+    with open(baseline_file) as f:
+        baseline = json.load(f)
+    key = lambda r: (r['name'], json.dumps(r['params'], sort_keys=True))
+    previous = dict((key(r), r) for r in baseline['results'])
+    print '\nCompared with %s:' % baseline_file
+    for result in results:
+        before = previous.get(key(result))
+        if before and before['median']:
+            print '%-24s %-36s %+7.1f%%' % (
+                result['name'], key(result)[1],
+                (result['median'] / before['median'] - 1) * 100)
+
+
+def main():
+    parser = OptionParser(usage='%prog [options]')
+    parser.add_option('--profile', default='quick', choices=sorted(PROFILES),
+                      help='Fixture sizes to use: %s.' % ', '.join(sorted(PROFILES)))
+    parser.add_option('--only', default='',
+                      help='Comma-separated names of benchmarks to run.')
+    parser.add_option('--output', default='benchmarks.json',
+                      help='File to write the JSON results to.')
+    parser.add_option('--compare', default=None,
+                      help='JSON results of a previous run to compare with.')
+    parser.add_option('--database', default=None,
+                      help='SQLite database file (default: a temporary file).')
+    opts, args = parser.parse_args()
+
+    database = opts.database or tempfile.mkstemp(suffix='.sqlite3')[1]
+    try:
+        configure(database)
+        options = PROFILES[opts.profile]
+        only = set(filter(None, opts.only.split(',')))
+        results = run_benchmarks(options, only)
+    finally:
+        if not opts.database:
+            os.remove(database)
+
+    with open(opts.output, 'w') as f:
+        json.dump({
+            'profile': opts.profile,
+            'options': options,
+            'environment': environment(),
+            'results': results,
+        }, f, indent=2, sort_keys=True)
+    print '\nResults written to %s' % opts.output
+    if opts.compare:
+        compare(results, opts.compare)
+
+
+if __name__ == '__main__':
+    main()
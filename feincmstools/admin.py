@@ -1,11 +1,125 @@
 from django.conf import settings
+from django.db import transaction
+from django.db.models import F, IntegerField, CharField
 from django.utils.translation import ugettext as _
 
 from feincms.admin.item_editor import ItemEditor
 from feincms.admin.tree_editor import TreeEditor
 
+from . import snapshots, usage, versioning
+from .transactions import commit_hooks
+
+try:
+    from django.db.models import Case, When, Value
+except ImportError: # Django < 1.8
+    Case = None
+
+# Inline fields which only say where a content item goes.
+POSITION_FIELDS = ('region', 'ordering')
+
 class FeinCMSDocumentAdmin(ItemEditor):
 
+    # The views below save in a transaction, and return after it commits, so
+    # caches are invalidated again at the end of commit_hooks().
+
+    def changeform_view(self, *args, **kwargs):
+        # Rebuild content snapshots once, not for every content item saved.
+        with commit_hooks(), snapshots.deferred_snapshots():
+            return super(FeinCMSDocumentAdmin, self).changeform_view(
+                *args, **kwargs)
+
+    def changelist_view(self, *args, **kwargs):
+        with commit_hooks():
+            return super(FeinCMSDocumentAdmin, self).changelist_view(
+                *args, **kwargs)
+
+    def delete_view(self, *args, **kwargs):
+        with commit_hooks():
+            return super(FeinCMSDocumentAdmin, self).delete_view(
+                *args, **kwargs)
+
+    def get_changelist(self, request, **kwargs):
+        """
+        Leaves content snapshots out of the listed documents.
+        """
+        changelist = super(FeinCMSDocumentAdmin, self).get_changelist(
+            request, **kwargs)
+        if not issubclass(self.model, snapshots.ContentSnapshot):
+            return changelist
+
+        class SnapshotDeferringChangeList(changelist):
+            def get_results(self, request):
+                self.queryset = snapshots.defer_snapshot(self.queryset)
+                super(SnapshotDeferringChangeList, self).get_results(request)
+
+        return SnapshotDeferringChangeList
+
+    def save_related(self, request, form, formsets, change):
+        with transaction.atomic():
+            super(FeinCMSDocumentAdmin, self).save_related(
+                request, form, formsets, change)
+
+    def save_formset(self, request, form, formset, change):
+        """
+        Saves content items which were only moved (i.e. only their ``region``
+        and/or ``ordering`` changed) with one bulk UPDATE per content type,
+        rather than saving each item. No ``pre_save``/``post_save`` signals
+        are sent for those items.
+        """
+        moved = {}
+        if change and getattr(formset.model, '_feincms_content_class', None):
+            deleted = formset.deleted_forms if formset.can_delete else []
+            for inline_form in formset.initial_forms:
+                if inline_form in deleted:
+                    continue
+                changed = inline_form.changed_data
+                if changed and set(changed) <= set(POSITION_FIELDS):
+                    moved[inline_form] = changed
+        if not moved:
+            return super(FeinCMSDocumentAdmin, self).save_formset(
+                request, form, formset, change)
+
+        self._update_positions(formset.model, dict(
+            (inline_form.instance.pk, dict(
+                (name, inline_form.cleaned_data[name]) for name in changed))
+            for inline_form, changed in moved.items()))
+        versioning.bump_version(self.model, [form.instance.pk])
+        snapshots.schedule_rebuild(self.model, form.instance.pk, form.instance)
+        # Save everything else as formset.save() would.
+        moved_pks = set(inline_form.instance.pk for inline_form in moved)
+        instances = formset.save(commit=False)
+        for obj in formset.deleted_objects:
+            obj.delete()
+        for instance in instances:
+            if instance.pk is None or instance.pk not in moved_pks:
+                instance.save()
+        for inline_form in formset.saved_forms:
+            if inline_form not in moved:
+                inline_form.save_m2m()
+
+    def _update_positions(self, model, positions):
+        """
+        Applies ``positions``, a dict of ``{pk: {field: value}}``, to
+        ``model`` content items.
+        """
+        usage.record_usage(self.model, model, set(
+            values['region'] for values in positions.values()
+            if 'region' in values))
+        manager = model._default_manager
+        if Case is None:
+            for pk, values in positions.items():
+                manager.filter(pk=pk).update(**values)
+            return
+        output_fields = {'region': CharField(), 'ordering': IntegerField()}
+        updates = {}
+        for name in POSITION_FIELDS:
+            whens = [When(pk=pk, then=Value(values[name]))
+                     for pk, values in positions.items() if name in values]
+            if whens:
+                updates[name] = Case(*whens, default=F(name),
+                                     output_field=output_fields[name])
+        manager.filter(pk__in=list(positions)).update(**updates)
+
     def get_template_list(self):
         opts = self.model._meta
         return [
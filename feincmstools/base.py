@@ -2,13 +2,20 @@
 
 from collections import defaultdict
 from collections import OrderedDict as SortedDict
+from multiprocessing.pool import ThreadPool
+import operator
 import sys
 
-from django.db import models
+from django.db import connections, models
+from django.db.models import Q
+from django.db.models.base import ModelState
 from django.http import HttpRequest
+from django.utils import translation
+from django.utils.safestring import mark_safe
 from django.utils.translation import ugettext_lazy as _
 
-from feincms.models import create_base_model
+from feincms.models import create_base_model, ContentProxy as BaseContentProxy
+from feincms.templatetags.feincms_tags import _render_content
 from mptt.models import MPTTModel, MPTTModelBase
 
 from django.template.loader import render_to_string, get_template
@@ -16,6 +23,10 @@ from django.template.context import RequestContext, Context
 from django.template import TemplateDoesNotExist, Template
 
 from .models import create_content_types
+from . import budgets, navigation, snapshots, usage, versioning
+from .instrumentation import Timer
+from .signals import (content_rendered, template_resolved, content_loaded,
+    search_text_rendered)
 from . import settings as feincmstools_settings
 
 
@@ -33,6 +44,213 @@ class FeinCMSDocumentBase(models.base.ModelBase):
         new_class._register()
         return new_class
 
+class ContentProxy(BaseContentProxy):
+    """
+    FeinCMS ``ContentProxy`` which reports how long loading content takes
+    through the ``content_loaded`` signal.
+
+    Empty inherited regions are resolved with a single query over all the
+    ancestors, rather than one query per ancestor until content is found.
+    Content types and regions which the usage index
+    (:py:mod:`feincmstools.usage`) knows to have no rows are left out of the
+    queries.
+    """
+
+    def _fetch_content_type_counts(self):
+        if 'counts' in self._cache:
+            return self._cache['counts']
+        with Timer() as timer:
+            counts = self._fetch_content_type_count_helper(self.item.pk)
+            empty_inherited_regions = tuple(
+                region.key for region in self.item.template.regions
+                if region.inherited and not counts.get(region.key))
+            if empty_inherited_regions:
+                counts.update(self._fetch_inherited_counts(empty_inherited_regions))
+            self._cache['counts'] = counts
+        if timer.active:
+            content_loaded.send(sender=type(self.item), document=self.item,
+                stage='counts', duration=timer.duration, queries=timer.queries)
+        return counts
+
+    def _fetch_inherited_counts(self, regions):
+        """
+        Returns the counts of ``regions`` (in the format of
+        ``_fetch_content_type_counts``) taken from the nearest ancestor with
+        content in each, and remembers which ancestor that was in
+        ``self._cache['inherited']``.
+        """
+        ancestors = list(self._inherit_from())
+        if not ancestors:
+            return {}
+        by_parent = self._count_contents(ancestors, regions)
+        counts = {}
+        inherited = self._cache.setdefault('inherited', {})
+        for region in regions:
+            for pk in ancestors: # nearest first
+                if (pk, region) in by_parent:
+                    counts[region] = by_parent[(pk, region)]
+                    inherited[region] = pk
+                    break
+        return counts
+
+    def _fetch_content_type_count_helper(self, pk, regions=None):
+        counts = {}
+        for (parent_id, region), region_counts in self._count_contents(
+                [pk], regions).items():
+            counts[region] = region_counts
+        return counts
+
+    def _count_contents(self, pks, regions=None):
+        """
+        Counts the content of the documents ``pks`` in ``regions`` (default:
+        all) with one query, and returns ``{(pk, region): [(pk, ct_idx)]}``
+        for those with content.
+        """
+        usage_index = usage.get_usage_index(self.item._meta.concrete_model)
+        parts = []
+        args = []
+        for idx, cls in enumerate(self.item._feincms_content_types):
+            type_regions = regions
+            if usage_index is not None:
+                used = usage_index.get(cls.__name__, set())
+                type_regions = [r for r in (regions or used) if r in used]
+                if not type_regions:
+                    continue # no rows in these regions
+            sql = ('SELECT %d AS ct_idx, parent_id, region, COUNT(id) FROM %s '
+                   'WHERE parent_id IN (%s)') % (
+                idx, cls._meta.db_table, ','.join(['%s'] * len(pks)))
+            args.extend(pks)
+            if type_regions:
+                sql += ' AND region IN (%s)' % ','.join(['%s'] * len(type_regions))
+                args.extend(type_regions)
+            parts.append(sql + ' GROUP BY parent_id, region')
+        if not parts:
+            return {}
+        sql = 'SELECT * FROM ( ' + ' UNION '.join(parts) + ' ) AS ct ORDER BY ct_idx'
+        cursor = connections[self.db].cursor()
+        cursor.execute(sql, args)
+
+        counts = {}
+        for ct_idx, parent_id, region, count in cursor.fetchall():
+            if count:
+                counts.setdefault((parent_id, region), []).append(
+                    (parent_id, ct_idx))
+        return counts
+
+    def _fetch_regions(self):
+        if 'regions' in self._cache:
+            return self._cache['regions']
+        with Timer() as timer:
+            regions = super(ContentProxy, self)._fetch_regions()
+        if timer.active:
+            content_loaded.send(sender=type(self.item), document=self.item,
+                stage='contents', duration=timer.duration, queries=timer.queries)
+        return regions
+
+
+class SnapshotContentProxy(ContentProxy):
+    """
+    Content proxy for documents with a
+    :py:class:`~feincmstools.snapshots.ContentSnapshot`, which hydrates
+    content from the snapshots of the document and, for empty inherited
+    regions, its ancestors. If a snapshot is missing or out of date,
+    content is loaded from the tables as usual.
+    """
+
+    def __init__(self, item):
+        super(SnapshotContentProxy, self).__init__(item)
+        regions, documents = self._load_snapshots()
+        if regions is None:
+            return
+        documents[self.item.pk] = self.item
+        content_types = self.item._feincms_content_types
+        cts = dict((cls, []) for cls in content_types)
+        counts = {}
+        for region, contents in regions.items():
+            for content in contents:
+                cts[content.__class__].append(content)
+                count = (content.parent_id, content_types.index(content.__class__))
+                if count not in counts.setdefault(region, []):
+                    counts[region].append(count)
+                # FeinCMS shares the proxy with every content's parent.
+                setattr(content, content._meta.get_field('parent')\
+                    .get_cache_name(), documents[content.parent_id])
+        self._cache['cts'] = cts
+        self._cache['counts'] = counts
+        self.item._content_proxy = self
+
+    def _load_snapshots(self):
+        """
+        Returns the content of the snapshots by region, or ``None``, and the
+        ancestors whose content is used, by pk.
+        """
+        model = self.item._meta.concrete_model
+        ancestor_documents = {}
+        with Timer() as timer:
+            regions = snapshots.load_snapshot(model, self.item.content_snapshot,
+                                              self.db)
+            empty_inherited_regions = regions is not None and [
+                region.key for region in self.item.template.regions
+                if region.inherited and not regions.get(region.key)]
+            if empty_inherited_regions:
+                ancestors = list(self._inherit_from())
+                documents = model._default_manager.using(self.db)\
+                    .in_bulk(ancestors)
+                for pk in ancestors: # nearest first
+                    ancestor_regions = snapshots.load_snapshot(
+                        model, getattr(documents.get(pk), 'content_snapshot', ''),
+                        self.db)
+                    if ancestor_regions is None:
+                        regions = None
+                        break
+                    for region in list(empty_inherited_regions):
+                        if ancestor_regions.get(region):
+                            regions[region] = ancestor_regions[region]
+                            ancestor_documents[pk] = documents[pk]
+                            empty_inherited_regions.remove(region)
+                    if not empty_inherited_regions:
+                        break
+        if regions is not None and timer.active:
+            content_loaded.send(sender=model, document=self.item,
+                stage='snapshot', duration=timer.duration, queries=timer.queries)
+        return regions, ancestor_documents
+
+
+class ContentRowProxy(ContentProxy):
+    """
+    Content proxy which loads the content types that allow it
+    (``values_render = True``) as read-only :py:class:`ContentRow`s rather
+    than model instances. See ``FeinCMSDocument.content_rows``.
+    """
+
+    def _populate_content_type_caches(self, types):
+        counts_by_type = {}
+        for region, counts in self._fetch_content_type_counts().items():
+            for pk, ct_idx in counts:
+                counts_by_type.setdefault(
+                    self.item._feincms_content_types[ct_idx], []
+                ).append((region, pk))
+
+        for cls in self.item._feincms_content_types:
+            if not issubclass(cls, tuple(types)) or cls in self._cache['cts']:
+                continue
+            counts = counts_by_type.get(cls)
+            if not counts:
+                self._cache['cts'][cls] = []
+                continue
+            filters = reduce(operator.or_,
+                             (Q(region=region, parent=pk) for region, pk in counts))
+            if getattr(cls, 'values_render', False):
+                self._cache['cts'][cls] = [
+                    ContentRow(cls, values, self)
+                    for values in cls._default_manager.using(self.db)
+                        .filter(filters).values()]
+            else:
+                self._cache['cts'][cls] = list(cls.get_queryset(filters))
+                for obj in self._cache['cts'][cls]:
+                    setattr(obj.parent, '_content_proxy', self)
+
+
 class FeinCMSDocument(create_base_model()):
     """
     A model which can have FeinCMS content chunks attached to it.
@@ -92,6 +310,7 @@ class FeinCMSDocument(create_base_model()):
     # PUBLIC
     feincms_templates = None
     feincms_regions = None
+    content_proxy_class = ContentProxy
 
     class Meta:
         abstract = True
@@ -173,6 +392,63 @@ class FeinCMSDocument(create_base_model()):
             return True
         return False
 
+    @property
+    def content_rows(self):
+        """
+        Like ``content``, but content types with ``values_render = True`` are
+        loaded with ``.values()`` as read-only ``ContentRow``s, which skips
+        model instantiation. Use it for read-only rendering, e.g. through
+        ``render_region(..., values_only=True)`` or
+        ``{% feincms_render_region_values object region request %}``.
+        """
+        if not hasattr(self, '_content_row_proxy'):
+            self._content_row_proxy = ContentRowProxy(self)
+        return self._content_row_proxy
+
+    def render_region(self, region, request, context=None, values_only=False):
+        """
+        Returns the rendered content of ``region``, as
+        ``{% feincms_render_region object region request %}`` would.
+        If ``values_only``, content is loaded from ``content_rows``.
+
+        The ``extra_context`` of content types with
+        ``concurrent_extra_context = True`` is fetched for all their items
+        in the region at once, in threads, before rendering starts.
+        """
+        if context is None:
+            context = RequestContext(request, {'object': self})
+        proxy = self.content_rows if values_only else self.content
+        contents = getattr(proxy, region)
+        prefetch_extra_context(contents, request)
+        render = lambda: mark_safe(''.join(
+            _render_content(content, request=request, context=context) or ''
+            for content in contents))
+        if isinstance(context, RequestContext) and \
+                getattr(context, 'template', False) is None:
+            # Outside a template, run the context processors once now,
+            # rather than each time an item's template binds the context.
+            with context.bind_template(Template('')):
+                return render()
+        return render()
+
+    @classmethod
+    def get_published(cls):
+        """
+        :return: The documents which should be published by
+        :py:mod:`feincmstools.publish`, without their content snapshots.
+        Override to exclude drafts etc.
+        :rtype: ``QuerySet``
+        """
+        return snapshots.defer_snapshot(cls._default_manager.all())
+
+    def get_content_version(self):
+        """
+        :return: A ``(token, last_modified)`` tuple which changes whenever the
+        document or its content does, without loading the content. See
+        :py:mod:`feincmstools.versioning`.
+        """
+        return versioning.get_version(self._meta.concrete_model, [self.pk])
+
     @classmethod
     def get_used_content_types(cls):
         """
@@ -206,10 +482,19 @@ class FeinCMSDocument(create_base_model()):
         """
         Create the tables for the attached content_types.
         """
-        if not cls._meta.abstract: # concrete subclasses only
+        if cls._meta.proxy:
+            # Proxies, including Django's deferred classes, share the content
+            # types of the concrete class, but their saves are sent with
+            # their own class as the sender.
+            cls._connect_signals()
+        elif not cls._meta.abstract: # concrete subclasses only
             # register templates or regions
             cls._register_templates_or_regions()
             cls._register_content_types()
+            if issubclass(cls, snapshots.ContentSnapshot) and \
+                    cls.content_proxy_class is ContentProxy:
+                cls.content_proxy_class = SnapshotContentProxy
+            cls._connect_signals()
 
     @classmethod
     def _register_templates_or_regions(cls):
@@ -231,17 +516,30 @@ class FeinCMSDocument(create_base_model()):
     def _register_content_types(cls):
         return create_content_types(cls, cls.content_types_by_region)
 
+    @classmethod
+    def _connect_signals(cls):
+        """
+        Connect signal receivers for the concrete class, or a proxy of it.
+        """
+        versioning.connect_versioning(cls)
+        snapshots.connect_snapshots(cls)
+        usage.connect_usage(cls)
+
     def search_text(self):
-        request = HttpRequest()
-        template = Template('''{% load feincms_tags %}
-            {% filter striptags %}
-            {% feincms_render_region object "main" request %}
-            {% endfilter %}
-            ''')
-        context = RequestContext(request)
-        context['object'] = self
-        #import pdb;pdb.set_trace()
-        return template.render(context)
+        with Timer() as timer:
+            request = HttpRequest()
+            template = Template('''{% load feincms_tags %}
+                {% filter striptags %}
+                {% feincms_render_region object "main" request %}
+                {% endfilter %}
+                ''')
+            context = RequestContext(request)
+            context['object'] = self
+            text = template.render(context)
+        if timer.active:
+            search_text_rendered.send(sender=type(self), document=self,
+                duration=timer.duration, queries=timer.queries)
+        return text
 
 class HierarchicalFeinCMSDocumentBase(FeinCMSDocumentBase, MPTTModelBase):
     pass
@@ -264,6 +562,23 @@ class HierarchicalFeinCMSDocument(FeinCMSDocument, MPTTModel):
         abstract = True
         ordering = ['tree_id', 'lft'] # required for FeinCMS TreeEditor
 
+    @classmethod
+    def _connect_signals(cls):
+        # Called from the metaclass, so super() can't be used here.
+        FeinCMSDocument._connect_signals.im_func(cls)
+        navigation.connect_invalidation(cls)
+
+    def get_content_version(self):
+        """
+        Like ``FeinCMSDocument.get_content_version``, but if the template has
+        inherited regions, the ancestors' versions are included.
+        """
+        model = self._meta.concrete_model
+        if not any(region.inherited for region in self.template.regions):
+            return versioning.get_version(model, [self.pk])
+        ancestors = self.get_ancestors().values_list('pk', flat=True)
+        return versioning.get_version(model, [self.pk] + list(ancestors))
+
     def get_path(self):
         """ Returns list of slugs from tree root to self. """
         # TODO: cache in database for efficiency?
@@ -273,6 +588,12 @@ class HierarchicalFeinCMSDocument(FeinCMSDocument, MPTTModel):
 
 #-------------------------------------------------------------------------------
 
+# Resolved template paths, keyed by ('render', content class, region) or
+# ('admin', content class), and compiled templates keyed by path. Only used
+# if FEINCMSTOOLS_CACHE_TEMPLATE_PATHS.
+_template_path_cache = {}
+_compiled_template_cache = {}
+
 class Content(models.Model):
     """
     A feincms content type that uses a template
@@ -291,14 +612,61 @@ class Content(models.Model):
 
     The template searches up through the model hierarchy until it finds a
     suitable template.
+
+    Content types which look up related objects for their templates can
+    define a ``bulk_extra_context(cls, contents, request)`` classmethod. It is
+    called once with all the items of that type in a region, before the
+    first of them is rendered, and returns a list of context dicts, one for
+    each of ``contents``. ``extra_context(request)`` is still called per item,
+    after the bulk context has been applied.
+
+    Content types can be rendered from a read-only :py:class:`ContentRow`
+    instead of a model instance (see ``FeinCMSDocument.content_rows``).
+    Set ``values_render = False`` on types whose templates or hooks need a
+    real model instance.
+
+        @classmethod
+        def bulk_extra_context(cls, contents, request):
+            images = Image.objects.in_bulk([c.image_id for c in contents])
+            return [{'image': images.get(c.image_id)} for c in contents]
+
+    Content types whose ``extra_context`` waits on the network or storage
+    (feeds, remote APIs, thumbnailing) can set
+    ``concurrent_extra_context = True``, so that
+    ``FeinCMSDocument.render_region`` calls it for all their items in a
+    region concurrently, in threads, rather than one after the other.
+    ``extra_context`` must then be thread-safe, and shouldn't rely on
+    thread-locals other than the active language.
+
+    Content types which may be slow or fail (embeds of other services,
+    expensive queries) can set a ``render_budget`` in seconds. Items which
+    fail to render are replaced by their last good rendering, or by
+    ``render_placeholder``; after ``render_failure_threshold`` failed or
+    over-budget renderings in a row, the type isn't rendered at all for
+    ``render_cooldown`` seconds. The last good rendering is shared by all
+    requests, unless ``render_fallback_vary(self, request)`` returns what it
+    should vary on. See :py:mod:`feincmstools.budgets`.
     """
     class Meta:
         abstract = True
 
     admin_template = None # For initialisation in the admin
     render_template = None # For rendering on the front end
+    bulk_extra_context = None # Optional classmethod, see above
+    values_render = True # Can be rendered from a ContentRow, see above
+    concurrent_extra_context = False # Fetch extra_context in threads, see above
+    render_budget = None # Seconds, see above
+    render_failure_threshold = 3
+    render_cooldown = 60 # Seconds
+    render_placeholder = '' # HTML used when there is no last good rendering
+    render_fallback_vary = None # Optional method, see above
 
     def render(self, **kwargs):
+        if self.render_budget is not None:
+            return budgets.render_with_budget(self, self._render, **kwargs)
+        return self._render(**kwargs)
+
+    def _render(self, **kwargs):
         template = self.render_template or self._find_render_template_path(self.region)
         if not template:
             raise NotImplementedError(
@@ -309,15 +677,75 @@ class Content(models.Model):
             )
         # Request is required, throw a KeyError if it's not there
         request = kwargs['request']
-        context = kwargs.get('context', {})
-        context['content'] = self
-        if hasattr(self, 'extra_context') and callable(self.extra_context):
-            context.update(self.extra_context(request))
-        if hasattr(context, 'flatten'):
-            # render_to_string expects a dictionary, not a context, this is
-            # more strictly enforced in Django 1.8
-            context = context.flatten()
-        return render_to_string(template, context, context_instance=RequestContext(request))
+        with Timer() as timer:
+            context = kwargs.get('context', {})
+            layer = {'content': self}
+            if self.bulk_extra_context is not None:
+                layer.update(self._get_bulk_extra_context(request))
+            if hasattr(self, 'extra_context') and callable(self.extra_context):
+                layer.update(self._get_extra_context(request))
+            if isinstance(context, RequestContext):
+                # Context processors have already run for this context, so
+                # render into it rather than building a new one per item.
+                context.update(layer)
+                try:
+                    output = Content._get_template(template).render(context)
+                finally:
+                    context.pop()
+            else:
+                if hasattr(context, 'flatten'):
+                    # render_to_string expects a dictionary, not a context, this is
+                    # more strictly enforced in Django 1.8
+                    context = context.flatten()
+                context.update(layer)
+                output = render_to_string(template, context, context_instance=RequestContext(request))
+        if timer.active:
+            content_rendered.send(sender=self.__class__, instance=self,
+                region=self.region, template=template,
+                duration=timer.duration, queries=timer.queries)
+        return output
+
+    def _get_extra_context(self, request):
+        """
+        Return ``extra_context(request)``, unless it was already fetched by
+        :py:func:`prefetch_extra_context`. An exception raised while
+        prefetching is raised here, so that it fails this item's rendering.
+        """
+        cached = getattr(self, '_extra_context', None)
+        if cached is not None and cached[0] is request:
+            context, exc_info = cached[1:]
+            if exc_info is not None:
+                raise exc_info[0], exc_info[1], exc_info[2]
+            return context
+        return self.extra_context(request)
+
+    def _get_bulk_extra_context(self, request):
+        """
+        Return this item's share of ``bulk_extra_context``, calling it for all
+        the items of this type in the region the first time one is rendered
+        for ``request``.
+        """
+        cached = getattr(self, '_bulk_context', None)
+        if cached is not None and cached[0] is request:
+            return cached[1]
+
+        contents = [self]
+        # The content proxy shares itself with the (select_related) parent of
+        # every item it loads; don't query for a parent that isn't cached.
+        proxy = getattr(self, '_content_proxy', None) # ContentRows only
+        if proxy is None:
+            parent_cache = self._meta.get_field('parent').get_cache_name()
+            proxy = getattr(getattr(self, parent_cache, None), '_content_proxy', None)
+        if proxy is not None:
+            siblings = [c for c in proxy._fetch_regions().get(self.region, [])
+                        if c.__class__ is self.__class__]
+            if self in siblings:
+                contents = [self if c == self else c for c in siblings]
+
+        for content, context in zip(
+                contents, self.bulk_extra_context(contents, request)):
+            content._bulk_context = (request, context)
+        return self._bulk_context[1]
 
     def __init__(self, *args, **kwargs):
         super(Content, self).__init__(*args, **kwargs)
@@ -375,9 +803,8 @@ class Content(models.Model):
             yield path
 
     def _find_admin_template_path(self):
-        for p in self._admin_template_paths():
-            if Content._detect_template(p):
-                return p
+        return Content._resolve_template(
+            ('admin', type(self)), None, self._admin_template_paths())
 
     def _render_template_paths(self, region):
         """
@@ -395,7 +822,7 @@ class Content(models.Model):
         pt3= "content_types/%(content_type_defining_app)s/%(content_model_name)s/%(content_type_using_region)s.html"
         pt4= "content_types/%(content_type_defining_app)s/%(content_model_name)s/render.html"
 
-        klass = type(self) #the concrete model
+        klass = self.__class__ #the concrete model
         for base in Content._bases_that_are_content_types(klass):
             params = Content._template_params(klass, base, region)
             yield pt1 % params
@@ -404,9 +831,52 @@ class Content(models.Model):
             yield pt4 % params
 
     def _find_render_template_path(self, region):
-        for p in self._render_template_paths(region):
-            if Content._detect_template(p):
-                return p
+        return Content._resolve_template(
+            ('render', self.__class__, region), region,
+            self._render_template_paths(region))
+
+    @staticmethod
+    def _resolve_template(key, region, paths):
+        """
+        Return the first of ``paths`` that exists, remembering the answer
+        under ``key`` if FEINCMSTOOLS_CACHE_TEMPLATE_PATHS is set.
+        """
+        use_cache = feincmstools_settings.CACHE_TEMPLATE_PATHS
+        cache_hit = use_cache and key in _template_path_cache
+        probes = 0
+        with Timer() as timer:
+            if cache_hit:
+                path = _template_path_cache[key]
+            else:
+                path = None
+                for p in paths:
+                    probes += 1
+                    if Content._detect_template(p):
+                        path = p
+                        break
+                if use_cache:
+                    _template_path_cache[key] = path
+        if timer.active:
+            template_resolved.send(sender=key[1], region=region, template=path,
+                probes=probes, cache_hit=cache_hit,
+                duration=timer.duration, queries=timer.queries)
+        return path
+
+    @staticmethod
+    def _get_template(path):
+        """
+        Return the compiled template at ``path``, which can be rendered with a
+        ``Context``. Cached if FEINCMSTOOLS_CACHE_TEMPLATE_PATHS is set.
+        """
+        template = _compiled_template_cache.get(path)
+        if template is None:
+            template = get_template(path)
+            # Django >= 1.8 wraps the template for its backend API, which
+            # only accepts dicts.
+            template = getattr(template, 'template', template)
+            if feincmstools_settings.CACHE_TEMPLATE_PATHS:
+                _compiled_template_cache[path] = template
+        return template
 
     @staticmethod
     def _detect_template(path):
@@ -420,6 +890,93 @@ class Content(models.Model):
         except TemplateDoesNotExist:
             return None
 
+def _fetch_extra_context(args):
+    """
+    Returns ``(extra context, None)``, or ``(None, exc_info)`` if fetching it
+    raised.
+    """
+    content, request, language = args
+    try:
+        with translation.override(language):
+            return content.extra_context(request), None
+    except Exception:
+        return None, sys.exc_info()
+    finally:
+        # Don't leave a database connection open per worker thread.
+        for connection in connections.all():
+            connection.close()
+
+
+def prefetch_extra_context(contents, request):
+    """
+    Calls ``extra_context(request)`` concurrently for the ``contents`` whose
+    types set ``concurrent_extra_context``, using up to
+    FEINCMSTOOLS_EXTRA_CONTEXT_THREADS threads, and keeps the results for
+    ``Content.render``. Exceptions are raised when the item is rendered, so
+    that its render budget handles them. Items of types whose circuit
+    breaker isn't closed are left alone; they aren't rendered, or only as
+    a trial which fetches its own.
+    """
+    contents = [c for c in contents
+                if getattr(c, 'concurrent_extra_context', False) and
+                callable(getattr(c, 'extra_context', None)) and
+                (getattr(c, 'render_budget', None) is None or
+                 budgets.is_closed(c.__class__))]
+    threads = min(len(contents), feincmstools_settings.EXTRA_CONTEXT_THREADS)
+    if threads < 2:
+        return
+    language = translation.get_language()
+    pool = ThreadPool(threads)
+    try:
+        results = pool.map(_fetch_extra_context,
+                           [(content, request, language) for content in contents])
+    finally:
+        pool.close()
+        pool.join()
+    for content, (context, exc_info) in zip(contents, results):
+        content._extra_context = (request, context, exc_info)
+
+
+class ContentRow(object):
+    """
+    A read-only stand-in for an instance of a content type, built from a
+    ``.values()`` row, so that rendering doesn't pay for model instantiation.
+
+    Field values are plain attributes. Anything else is looked up on the
+    content type and bound to the row, so methods and properties which only
+    use field values work as they would on an instance, and the row reports
+    the content type as its ``__class__``.
+    """
+
+    def __init__(self, content_type, values, proxy=None):
+        self.__dict__.update(values)
+        self.__dict__['_content_type'] = content_type
+        self.__dict__['_content_proxy'] = proxy
+        self.__dict__['_state'] = ModelState(db=proxy and proxy.db)
+        self.__dict__['_state'].adding = False
+
+    @property
+    def __class__(self):
+        return self._content_type
+
+    def __getattr__(self, name):
+        for klass in self._content_type.__mro__:
+            if name in klass.__dict__:
+                attr = klass.__dict__[name]
+                if hasattr(attr, '__get__'):
+                    return attr.__get__(self, self._content_type)
+                return attr
+        raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        # Allow caches, e.g. of related objects.
+        if not name.startswith('_'):
+            raise AttributeError('%s is read-only' % type(self).__name__)
+        self.__dict__[name] = value
+
+    def __repr__(self):
+        return '<ContentRow %s %s>' % (self._content_type.__name__, self.pk)
+
 def LumpyContent(*args, **kwargs):
     from warnings import warn
     warn("Lumps are Content now: "
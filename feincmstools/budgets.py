@@ -0,0 +1,160 @@
+"""
+Render budgets and circuit breakers for content types. See
+``Content.render_budget``.
+
+A content type with a ``render_budget`` (in seconds) is rendered through
+:py:func:`render_with_budget`. Each successful rendering is kept in the
+cache as the item's last good output. A rendering that raises an exception
+is replaced by that output, or by the type's ``render_placeholder`` if there
+is none. A rendering that is merely over budget can't be interrupted, so
+its output is used, but it counts as a failure all the same.
+
+After ``render_failure_threshold`` failures in a row, the type's circuit
+breaker opens: for ``render_cooldown`` seconds, none of its items are
+rendered and the fallback is used instead. After that the breaker is
+half-open: the first rendering in the process is tried again, while the
+others keep getting the fallback for another cooldown. A failure of the
+trial reopens the breaker, and a success closes it.
+
+The last good output is cached per item and language only, so budgets are
+meant for content types whose output doesn't depend on the request (user,
+session, query string...). Otherwise, define ``render_fallback_vary(self,
+request)`` on the content type to return a string for the output to be
+cached under, e.g. whether the user is logged in.
+
+Each degraded rendering is logged to ``feincmstools.budgets`` and sent
+through the ``render_degraded`` signal with a ``reason`` of ``'slow'``,
+``'error'`` or ``'open'``. Breakers are kept per process.
+"""
+
+import hashlib
+import logging
+import threading
+import time
+
+from django.core.cache import cache
+from django.utils import translation
+from django.utils.encoding import force_bytes
+from django.utils.safestring import mark_safe
+
+from . import settings as feincmstools_settings
+from .signals import render_degraded
+
+logger = logging.getLogger('feincmstools.budgets')
+
+_lock = threading.Lock()
+# content type -> [consecutive failures, time until which the breaker is open]
+_breakers = {}
+
+
+def _fallback_key(content, request):
+    opts = content.__class__._meta
+    key = 'feincmstools:render:%s.%s:%s:%s' % (
+        opts.app_label, opts.object_name.lower(), content.pk,
+        translation.get_language())
+    vary = getattr(content, 'render_fallback_vary', None)
+    if vary is not None:
+        key += ':' + hashlib.md5(force_bytes(vary(request))).hexdigest()
+    return key
+
+
+def is_open(content_type):
+    """ Returns whether the breaker of ``content_type`` is open. """
+    failures, open_until = _breakers.get(content_type, (0, 0))
+    return time.time() < open_until
+
+
+def is_closed(content_type):
+    """
+    Returns whether the breaker of ``content_type`` is closed, i.e. neither
+    open nor half-open. Unlike :py:func:`allow_render`, doesn't claim the
+    trial rendering.
+    """
+    breaker = _breakers.get(content_type)
+    return breaker is None or not breaker[1]
+
+
+def allow_render(content_type):
+    """
+    Returns whether ``content_type`` may be rendered: if its breaker is
+    closed, or for the first caller once the cooldown has passed (the
+    breaker is half-open). That caller's rendering decides whether the
+    breaker closes or reopens; until then, the others are kept out for
+    another cooldown.
+    """
+    breaker = _breakers.get(content_type)
+    if breaker is None or not breaker[1]:
+        return True
+    with _lock:
+        now = time.time()
+        if now < breaker[1]:
+            return False
+        breaker[1] = now + content_type.render_cooldown
+        return True
+
+
+def record_failure(content_type):
+    with _lock:
+        breaker = _breakers.setdefault(content_type, [0, 0])
+        breaker[0] += 1
+        if breaker[0] >= content_type.render_failure_threshold:
+            breaker[1] = time.time() + content_type.render_cooldown
+
+
+def record_success(content_type):
+    if content_type in _breakers:
+        with _lock:
+            _breakers.pop(content_type, None)
+
+
+def reset():
+    """ Closes all breakers. """
+    with _lock:
+        _breakers.clear()
+
+
+def _degrade(content, reason, duration, exc_info=None):
+    content_type = content.__class__
+    logger.warning('Degraded rendering of %s %s in %s (%s, %.1fms)',
+                   content_type.__name__, content.pk, content.region, reason,
+                   duration * 1000, exc_info=exc_info)
+    render_degraded.send(sender=content_type, instance=content,
+        region=content.region, reason=reason, duration=duration)
+
+
+def _fallback(content, request):
+    output = cache.get(_fallback_key(content, request))
+    if output is None:
+        output = content.render_placeholder
+    return mark_safe(output)
+
+
+def render_with_budget(content, render, **kwargs):
+    """
+    Returns ``render(**kwargs)`` for ``content``, or its fallback if the
+    rendering fails or the content type's breaker is open.
+    """
+    content_type = content.__class__
+    request = kwargs.get('request')
+    if not allow_render(content_type):
+        _degrade(content, 'open', 0.0)
+        return _fallback(content, request)
+
+    start = time.time()
+    try:
+        output = render(**kwargs)
+    except Exception:
+        duration = time.time() - start
+        record_failure(content_type)
+        _degrade(content, 'error', duration, exc_info=True)
+        return _fallback(content, request)
+
+    duration = time.time() - start
+    if duration > content.render_budget:
+        record_failure(content_type)
+        _degrade(content, 'slow', duration)
+    else:
+        record_success(content_type)
+    cache.set(_fallback_key(content, request), output,
+              feincmstools_settings.RENDER_FALLBACK_TIMEOUT)
+    return output
@@ -0,0 +1,205 @@
+"""
+Copies FeinCMSDocuments, or whole subtrees of HierarchicalFeinCMSDocuments,
+along with all their content, in bulk.
+
+    from feincmstools.cloning import clone_document, clone_subtree
+
+    draft = clone_document(article, transform=lambda old, new: setattr(new, 'slug', old.slug + '-draft'))
+    copy = clone_subtree(section, parent=other_section)
+
+Documents and content are inserted with one ``bulk_create`` per tree level
+and content type, inside a single transaction, so no ``pre_save`` or
+``post_save`` signals are sent for them. The ``documents_cloned`` signal is
+sent instead, once the copies exist.
+
+Since ``save()`` isn't called, :py:class:`~feincmstools.mixins.HierarchicalSlug`
+paths are rebuilt here, as ``save()`` would, from the copy's own slug and
+the path of its parent's copy.
+"""
+
+from django.db import transaction
+
+from .mixins import HierarchicalSlug
+from .signals import documents_cloned
+
+# Stay well below SQLite's limit of 999 query parameters.
+CHUNK_SIZE = 500
+
+
+def _chunks(items, size=CHUNK_SIZE):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _copy(instance, **values):
+    """ Returns an unsaved copy of ``instance``, with ``values`` changed. """
+    model = type(instance)
+    fields = dict((field.attname, getattr(instance, field.attname))
+                  for field in model._meta.fields)
+    fields[model._meta.pk.attname] = None
+    fields.update(values)
+    return model(**fields)
+
+
+def _set_path_slug(copy, parent):
+    """
+    Sets the slug of a HierarchicalSlug ``copy`` to its last part, below the
+    slug of ``parent``, like ``HierarchicalSlug._generate_slug()`` does.
+    """
+    copy._the_slug = copy.truncated_slug()
+    if parent is not None and parent._the_slug:
+        copy._the_slug = '%s/%s' % (parent._the_slug, copy._the_slug)
+
+
+def _copy_many_to_many(model, id_map):
+    """
+    Copies the rows of the auto-created many-to-many tables of ``model``
+    from the old to the new pks in ``id_map``.
+    """
+    for field in model._meta.many_to_many:
+        through = field.rel.through
+        if not through._meta.auto_created:
+            continue
+        source = field.m2m_field_name()
+        target = field.m2m_reverse_field_name()
+        rows = []
+        for old_ids in _chunks(id_map):
+            rows.extend(
+                through(**{'%s_id' % source: id_map[old_id],
+                           '%s_id' % target: target_id})
+                for old_id, target_id in through._default_manager.filter(
+                    **{'%s__in' % source: old_ids}
+                ).values_list('%s_id' % source, '%s_id' % target))
+        through._default_manager.bulk_create(rows, batch_size=CHUNK_SIZE)
+
+
+def copy_content(model, id_map):
+    """
+    Copies all the content of the ``model`` documents whose pks are the keys
+    of ``id_map`` to the documents whose pks are the values.
+    """
+    for cls in model._feincms_content_types:
+        copies = []
+        for old_ids in _chunks(id_map):
+            for content in cls._default_manager.filter(parent__in=old_ids)\
+                    .order_by('pk'):
+                copy = _copy(content, parent_id=id_map[content.parent_id])
+                if cls._meta.many_to_many:
+                    # The copy's pk is needed for its many-to-many rows.
+                    copy.save(force_insert=True)
+                    _copy_many_to_many(cls, {content.pk: copy.pk})
+                else:
+                    copies.append(copy)
+        cls._default_manager.bulk_create(copies, batch_size=CHUNK_SIZE)
+
+
+def clone_document(document, transform=None):
+    """
+    Saves and returns a copy of ``document`` with all its content. A copy of a
+    HierarchicalFeinCMSDocument becomes the last child of the same parent,
+    without copies of the original's descendants; see :py:func:`clone_subtree`.
+
+    ``transform(original, copy)`` is called before the copy is saved, to
+    change e.g. its slug.
+    """
+    model = type(document)
+    tree_fields = {}
+    if hasattr(model, '_mptt_meta'):
+        # Leave it to MPTT to place the copy.
+        opts = model._mptt_meta
+        tree_fields = dict.fromkeys([opts.tree_id_attr, opts.left_attr,
+                                     opts.right_attr, opts.level_attr])
+    with transaction.atomic():
+        copy = _copy(document, **tree_fields)
+        if transform:
+            transform(document, copy)
+        copy.save()
+        _copy_many_to_many(model, {document.pk: copy.pk})
+        copy_content(model, {document.pk: copy.pk})
+    documents_cloned.send(sender=model, originals=[document], copies=[copy])
+    return copy
+
+
+def clone_subtree(root, parent=None, transform=None):
+    """
+    Copies ``root``, all its descendants and their content, and returns the
+    copy of ``root``. The copy becomes the last child of ``parent``, or a new
+    tree if ``parent`` is ``None``.
+
+    ``transform(original, copy)`` is called for each document before the
+    copies are saved, to change e.g. slugs. The paths of HierarchicalSlug
+    copies are then rebuilt below ``parent``, so ``transform`` need only
+    change the last part.
+    """
+    model = type(root)
+    manager = model._tree_manager
+    opts = root._mptt_meta
+
+    with transaction.atomic():
+        root = manager.get(pk=root.pk) # current tree fields
+        nodes = list(root.get_descendants(include_self=True))
+        size = getattr(root, opts.right_attr) - getattr(root, opts.left_attr) + 1
+
+        if parent is None:
+            tree_id = manager._get_next_tree_id()
+            left = 1
+            level = 0
+        else:
+            parent = manager.get(pk=parent.pk)
+            tree_id = getattr(parent, opts.tree_id_attr)
+            left = getattr(parent, opts.right_attr)
+            level = getattr(parent, opts.level_attr) + 1
+            manager._create_space(size, left - 1, tree_id)
+        left_change = left - getattr(root, opts.left_attr)
+        level_change = level - getattr(root, opts.level_attr)
+
+        # Insert one level at a time, so that parents have pks.
+        id_map = {}
+        originals = []
+        copies = []
+        copies_by_pk = {}
+        by_level = {}
+        for node in nodes:
+            by_level.setdefault(getattr(node, opts.level_attr), []).append(node)
+        for node_level in sorted(by_level):
+            level_copies = []
+            for node in by_level[node_level]:
+                copy = _copy(node, **{
+                    opts.tree_id_attr: tree_id,
+                    opts.left_attr: getattr(node, opts.left_attr) + left_change,
+                    opts.right_attr: getattr(node, opts.right_attr) + left_change,
+                    opts.level_attr: node_level + level_change,
+                    '%s_id' % opts.parent_attr:
+                        parent.pk if node.pk == root.pk and parent is not None
+                        else id_map.get(getattr(node, '%s_id' % opts.parent_attr)),
+                })
+                if transform:
+                    transform(node, copy)
+                if isinstance(copy, HierarchicalSlug):
+                    # Parents were inserted with the previous level.
+                    _set_path_slug(copy, parent if node.pk == root.pk else
+                        copies_by_pk[getattr(node, '%s_id' % opts.parent_attr)])
+                level_copies.append((node, copy))
+            manager.bulk_create([copy for node, copy in level_copies],
+                                batch_size=CHUNK_SIZE)
+            new_pks = dict(manager.filter(**{
+                opts.tree_id_attr: tree_id,
+                opts.level_attr: node_level + level_change,
+                '%s__gte' % opts.left_attr: left,
+                '%s__lt' % opts.left_attr: left + size,
+            }).values_list(opts.left_attr, 'pk'))
+            for node, copy in level_copies:
+                copy.pk = new_pks[getattr(copy, opts.left_attr)]
+                copy._state.adding = False
+                copy._state.db = manager.db
+                id_map[node.pk] = copy.pk
+                copies_by_pk[node.pk] = copy
+                originals.append(node)
+                copies.append(copy)
+
+        _copy_many_to_many(model, id_map)
+        copy_content(model, id_map)
+
+    documents_cloned.send(sender=model, originals=originals, copies=copies)
+    return copies[0]
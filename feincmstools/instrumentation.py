@@ -0,0 +1,242 @@
+"""
+Lightweight per-request collection of the timings sent through
+:py:mod:`feincmstools.signals`.
+
+    from feincmstools import instrumentation
+
+    instrumentation.start_collecting()
+    ... render some documents ...
+    collector = instrumentation.stop_collecting()
+    for (content_type, region), stat in collector.rendered.items():
+        print content_type, region, stat.count, stat.duration, stat.queries
+
+``feincmstools.middleware.InstrumentationMiddleware`` does this for every
+request, logs a summary and optionally emits a ``Server-Timing`` header.
+
+Nothing is timed, and the timing signals aren't sent, unless a collector is
+active in the current thread or FEINCMSTOOLS_TIMING_SIGNALS is set.
+"""
+
+import threading
+import time
+
+from django.db import connections
+
+from . import settings as feincmstools_settings
+from .signals import (content_rendered, template_resolved, content_loaded,
+    search_text_rendered, render_degraded)
+
+
+_local = threading.local()
+
+
+def query_count():
+    """
+    Returns the number of queries recorded so far on all database
+    connections, so that reads sent to a replica (see
+    :py:mod:`feincmstools.routers`) are counted too. This only changes when
+    Django is recording queries (i.e. DEBUG = True).
+    """
+    count = 0
+    for connection in connections.all():
+        # Django >= 1.8 keeps a bounded deque; ``connection.queries`` copies it.
+        queries_log = getattr(connection, 'queries_log', None)
+        if queries_log is None:
+            count += len(connection.queries)
+        else:
+            count += len(queries_log)
+    return count
+
+
+def is_active():
+    """
+    Returns whether timings should be measured and sent: while a collector
+    is active in the current thread, or always if FEINCMSTOOLS_TIMING_SIGNALS
+    is set.
+    """
+    return (feincmstools_settings.TIMING_SIGNALS or
+            getattr(_local, 'collector', None) is not None)
+
+
+class Timer(object):
+    """
+    Context manager which measures wall time and query count of its block,
+    available as ``duration`` and ``queries`` on exit. Measures nothing
+    unless :py:func:`is_active` on entry, which is kept as ``active``, so
+    that callers only send their signal ``if timer.active``.
+    """
+    active = False
+    duration = 0.0
+    queries = 0
+
+    def __enter__(self):
+        self.active = is_active()
+        if self.active:
+            self._start_queries = query_count()
+            self._start = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.active:
+            self.duration = time.time() - self._start
+            self.queries = query_count() - self._start_queries
+        return False
+
+
+class Stat(object):
+    """ Running totals for one key of a :py:class:`Collector`. """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.queries = 0
+        self.probes = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def add(self, duration, queries):
+        self.count += 1
+        self.duration += duration
+        self.queries += queries
+
+
+class Collector(object):
+    """
+    Aggregates the feincmstools signals sent while it is active.
+
+    ``rendered`` and ``templates`` are keyed by ``(content type name, region)``,
+    ``loaded`` by ``(document class name, stage)``, ``search_text`` by
+    document class name and ``degraded`` by ``(content type name, reason)``.
+    """
+
+    def __init__(self):
+        self.rendered = {}
+        self.templates = {}
+        self.loaded = {}
+        self.search_text = {}
+        self.degraded = {}
+
+    def _stat(self, stats, key):
+        if key not in stats:
+            stats[key] = Stat()
+        return stats[key]
+
+    def _totals(self, stats, key_index):
+        totals = {}
+        for key, stat in stats.items():
+            total = self._stat(totals, key[key_index])
+            for attr in ('count', 'duration', 'queries', 'probes',
+                         'cache_hits', 'cache_misses'):
+                setattr(total, attr, getattr(total, attr) + getattr(stat, attr))
+        return totals
+
+    def by_content_type(self):
+        """ Render totals keyed by content type name. """
+        return self._totals(self.rendered, 0)
+
+    def by_region(self):
+        """ Render totals keyed by region. """
+        return self._totals(self.rendered, 1)
+
+    def summary(self):
+        """ Returns a one-line, human-readable summary, slowest types first. """
+        totals = sorted(self.by_content_type().items(),
+                        key=lambda item: item[1].duration, reverse=True)
+        templates = self._totals(self.templates, 0).values()
+        summary = '%s | templates: %d probes, %d hits, %d misses' % (
+            ', '.join('%s: %d in %.1fms (%d queries)' % (
+                name, stat.count, stat.duration * 1000, stat.queries)
+                for name, stat in totals) or 'nothing rendered',
+            sum(stat.probes for stat in templates),
+            sum(stat.cache_hits for stat in templates),
+            sum(stat.cache_misses for stat in templates),
+        )
+        if self.degraded:
+            summary += ' | degraded: %s' % ', '.join(
+                '%s %s: %d' % (name, reason, stat.count)
+                for (name, reason), stat in sorted(self.degraded.items()))
+        return summary
+
+    def server_timing(self):
+        """
+        Returns the collected timings as a ``Server-Timing`` header value,
+        with one metric for loading and one per rendered content type.
+        """
+        metrics = []
+        loaded = self._totals(self.loaded, 1)
+        if loaded:
+            metrics.append('feincms-load;dur=%.2f;desc="%d queries"' % (
+                sum(stat.duration for stat in loaded.values()) * 1000,
+                sum(stat.queries for stat in loaded.values())))
+        for name, stat in sorted(self.by_content_type().items()):
+            metrics.append('feincms-%s;dur=%.2f;desc="%d items, %d queries"' % (
+                name, stat.duration * 1000, stat.count, stat.queries))
+        return ', '.join(metrics)
+
+
+def start_collecting():
+    """ Starts a new collector for the current thread and returns it. """
+    _local.collector = Collector()
+    return _local.collector
+
+
+def stop_collecting():
+    """ Stops collecting for the current thread and returns the collector. """
+    collector = get_collector()
+    _local.collector = None
+    return collector
+
+
+def get_collector():
+    """ Returns the active collector for the current thread, or ``None``. """
+    return getattr(_local, 'collector', None)
+
+
+def _record_render(sender, instance, region, template, duration, queries,
+                   **kwargs):
+    collector = get_collector()
+    if collector is not None:
+        collector._stat(collector.rendered, (sender.__name__, region))\
+            .add(duration, queries)
+
+
+def _record_template(sender, region, template, probes, cache_hit, duration,
+                     queries, **kwargs):
+    collector = get_collector()
+    if collector is not None:
+        stat = collector._stat(collector.templates,
+                               (sender.__name__, region))
+        stat.add(duration, queries)
+        stat.probes += probes
+        if cache_hit:
+            stat.cache_hits += 1
+        else:
+            stat.cache_misses += 1
+
+
+def _record_load(sender, document, stage, duration, queries, **kwargs):
+    collector = get_collector()
+    if collector is not None:
+        collector._stat(collector.loaded, (sender.__name__, stage))\
+            .add(duration, queries)
+
+
+def _record_search_text(sender, document, duration, queries, **kwargs):
+    collector = get_collector()
+    if collector is not None:
+        collector._stat(collector.search_text, sender.__name__)\
+            .add(duration, queries)
+
+
+def _record_degraded(sender, instance, region, reason, duration, **kwargs):
+    collector = get_collector()
+    if collector is not None:
+        collector._stat(collector.degraded, (sender.__name__, reason))\
+            .add(duration, 0)
+
+
+content_rendered.connect(_record_render)
+template_resolved.connect(_record_template)
+content_loaded.connect(_record_load)
+search_text_rendered.connect(_record_search_text)
+render_degraded.connect(_record_degraded)
@@ -0,0 +1,72 @@
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, DEFAULT_DB_ALIAS
+from django.db.models.loading import get_model, get_models
+
+from ...base import FeinCMSDocument
+from ... import settings as feincmstools_settings
+
+class Command(BaseCommand):
+    args = '[app.Model app.Model ...]'
+    help = 'Report content type tables of the specified FeinCMS documents (in app.Model format, default: all) which lack the FEINCMSTOOLS_CONTENT_TYPE_INDEX index.'
+    option_list = BaseCommand.option_list + (
+        make_option('--database', dest='database', default=DEFAULT_DB_ALIAS,
+            help='Database to check.'),
+        make_option('--sql', action='store_true', dest='sql', default=False,
+            help='Print the SQL to create the missing indexes.'),
+        )
+
+    def handle(self, *args, **options):
+        verbosity = int(options.get('verbosity', 1))
+        fields = tuple(feincmstools_settings.CONTENT_TYPE_INDEX or ())
+        if not fields:
+            raise CommandError('FEINCMSTOOLS_CONTENT_TYPE_INDEX is empty.')
+        connection = connections[options['database']]
+
+        if args:
+            models = []
+            for arg in args:
+                assert len(arg.split('.')) == 2, 'Arguments must be in app.Model format.'
+                model = get_model(*arg.split('.'))
+                assert model and issubclass(model, FeinCMSDocument), 'The model must be a FeinCMSDocument.'
+                models.append(model)
+        else:
+            models = [model for model in get_models()
+                      if issubclass(model, FeinCMSDocument)]
+
+        cursor = connection.cursor()
+        tables = set(connection.introspection.table_names(cursor))
+        missing = []
+        for model in models:
+            for content_type in model._feincms_content_types:
+                table = content_type._meta.db_table
+                if table not in tables:
+                    if verbosity:
+                        self.stdout.write('%s: table does not exist.' % table)
+                    continue
+                columns = [content_type._meta.get_field(name).column
+                           for name in fields]
+                constraints = connection.introspection.get_constraints(cursor, table)
+                # Any index starting with the wanted columns will do.
+                if any(constraint['columns'][:len(columns)] == columns
+                       for constraint in constraints.values()
+                       if constraint['index'] or constraint['unique']):
+                    if verbosity > 1:
+                        self.stdout.write('%s: OK' % table)
+                else:
+                    missing.append(content_type)
+                    self.stdout.write('%s: missing index on (%s).' % (
+                        table, ', '.join(columns)))
+
+        if options['sql'] and missing:
+            editor = connection.schema_editor()
+            for content_type in missing:
+                # alter_index_together() would rebuild the table on SQLite.
+                self.stdout.write('%s;' % editor._create_index_sql(content_type, [
+                    content_type._meta.get_field(name) for name in fields],
+                    suffix='_idx'))
+        if verbosity:
+            self.stdout.write('%d content type tables checked, %d missing the index.' % (
+                sum(len(model._feincms_content_types) for model in models),
+                len(missing)))
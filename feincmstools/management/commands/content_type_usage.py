@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.db.models.loading import get_model, get_models
+
+from ...base import FeinCMSDocument
+from ...usage import count_usage, refresh_usage
+
+class Command(BaseCommand):
+    args = '[app.Model app.Model ...]'
+    help = 'Count content rows per content type and region for the specified FeinCMS documents (in app.Model format, default: all), and refresh the cached usage index.'
+
+    def handle(self, *args, **options):
+        verbosity = int(options.get('verbosity', 1))
+        if args:
+            models = []
+            for arg in args:
+                assert len(arg.split('.')) == 2, 'Arguments must be in app.Model format.'
+                model = get_model(*arg.split('.'))
+                assert model and issubclass(model, FeinCMSDocument), 'The model must be a FeinCMSDocument.'
+                models.append(model)
+        else:
+            models = [model for model in get_models()
+                      if issubclass(model, FeinCMSDocument)]
+
+        for model in models:
+            counts = count_usage(model)
+            refresh_usage(model, counts)
+            if not verbosity:
+                continue
+            self.stdout.write('%s.%s:' % (model._meta.app_label, model.__name__))
+            for content_type in model._feincms_content_types:
+                regions = sorted((region, count) for (name, region), count
+                                 in counts.items() if name == content_type.__name__)
+                self.stdout.write('  %s: %s' % (content_type.__name__, ', '.join(
+                    '%s %d' % (region, count) for region, count in regions)
+                    or 'unused'))
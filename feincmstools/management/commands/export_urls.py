@@ -0,0 +1,44 @@
+from optparse import make_option
+
+from django.core.management.base import LabelCommand, CommandError
+from django.db.models.loading import get_model
+
+from ...base import HierarchicalFeinCMSDocument
+from ...publish import get_publish_storage
+from ...sitemaps import iter_urls, write_sitemaps
+
+class Command(LabelCommand):
+    args = '<app.Model app.Model ...>'
+    label = 'app.Model'
+    help = 'Print the URLs of published hierarchical FeinCMS documents of the specified models (in app.Model format), or write them to sitemap files.'
+    option_list = LabelCommand.option_list + (
+        make_option('--base-url', dest='base_url', default='',
+            help='Prepended to every path, e.g. http://example.com. Required with --sitemap.'),
+        make_option('--sitemap', action='store_true', dest='sitemap', default=False,
+            help='Write a sitemap index and sitemap files rather than printing URLs.'),
+        make_option('--lastmod', dest='lastmod', default=None,
+            help='Date or datetime field to take sitemap <lastmod> values from.'),
+        make_option('--root', dest='root', default=None,
+            help='Directory to write sitemaps to, instead of FEINCMSTOOLS_PUBLISH_ROOT or FEINCMSTOOLS_PUBLISH_STORAGE.'),
+        )
+
+    def handle_label(self, arg, **options):
+        verbosity = int(options.get('verbosity', 1))
+        assert len(arg.split('.')) == 2, 'Arguments must be in app.Model format.'
+        model = get_model(*arg.split('.'))
+        assert model and issubclass(model, HierarchicalFeinCMSDocument), 'The model must be a HierarchicalFeinCMSDocument.'
+        if not options['sitemap']:
+            for url, lastmod in iter_urls(model, options['base_url']):
+                self.stdout.write(url)
+            return
+        if not options['base_url']:
+            raise CommandError('Sitemaps need absolute URLs; set --base-url.')
+        try:
+            storage = get_publish_storage(options['root'])
+        except ValueError as e:
+            raise CommandError(e)
+        prefix = 'sitemap-%s' % arg.lower().replace('.', '-')
+        count = write_sitemaps(model, storage, options['base_url'],
+            lastmod_field=options['lastmod'], prefix=prefix)
+        if verbosity:
+            self.stdout.write('%s: %d URLs written to %s.xml.' % (arg, count, prefix))
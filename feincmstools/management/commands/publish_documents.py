@@ -0,0 +1,41 @@
+from optparse import make_option
+
+from django.core.management.base import LabelCommand, CommandError
+from django.db.models.loading import get_model
+
+from ...base import FeinCMSDocument
+from ...publish import Publisher, get_publish_storage, MODES
+
+class Command(LabelCommand):
+    args = '<app.Model app.Model ...>'
+    label = 'app.Model'
+    help = 'Render published FeinCMS documents of the specified models (in app.Model format) to static HTML.'
+    option_list = LabelCommand.option_list + (
+        make_option('--mode', dest='mode', default='page', choices=MODES,
+            help='Publish whole pages, regions or both (%s).' % ', '.join(MODES)),
+        make_option('--processes', dest='processes', type='int', default=1,
+            help='Number of worker processes to render with.'),
+        make_option('--root', dest='root', default=None,
+            help='Directory to publish to, instead of FEINCMSTOOLS_PUBLISH_ROOT or FEINCMSTOOLS_PUBLISH_STORAGE.'),
+        make_option('--force', action='store_true', dest='force', default=False,
+            help='Render all documents, not only those which changed since the last run.'),
+        )
+
+    def handle_label(self, arg, **options):
+        verbosity = int(options.get('verbosity', 1))
+        assert len(arg.split('.')) == 2, 'Arguments must be in app.Model format.'
+        model = get_model(*arg.split('.'))
+        assert model and issubclass(model, FeinCMSDocument), 'The model must be a FeinCMSDocument.'
+        try:
+            storage = get_publish_storage(options['root'])
+        except ValueError as e:
+            raise CommandError(e)
+        publisher = Publisher(storage, mode=options['mode'],
+            processes=options['processes'], force=options['force'])
+        stats = publisher.publish(model)
+        for key, error in sorted(stats['errors'].items()):
+            self.stderr.write('Failed to publish %s: %s' % (key, error))
+        if verbosity:
+            self.stdout.write('%s: %d rendered, %d unchanged, %d removed, %d failed.' % (
+                arg, stats['rendered'], stats['unchanged'], stats['removed'],
+                stats['failed']))
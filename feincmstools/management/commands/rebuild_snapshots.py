@@ -0,0 +1,23 @@
+from django.core.management.base import LabelCommand
+from django.db.models.loading import get_model
+
+from ...base import FeinCMSDocument
+from ...snapshots import ContentSnapshot, rebuild_snapshot
+
+class Command(LabelCommand):
+    args = '<app.Model app.Model ...>'
+    label = 'app.Model'
+    help = 'Rebuild the content snapshots of all documents of the specified models (in app.Model format).'
+
+    def handle_label(self, arg, **options):
+        verbosity = int(options.get('verbosity', 1))
+        assert len(arg.split('.')) == 2, 'Arguments must be in app.Model format.'
+        model = get_model(*arg.split('.'))
+        assert model and issubclass(model, FeinCMSDocument) and issubclass(model, ContentSnapshot), \
+            'The model must be a FeinCMSDocument with ContentSnapshot.'
+        count = 0
+        for pk in model._default_manager.values_list('pk', flat=True).iterator():
+            rebuild_snapshot(model, pk)
+            count += 1
+        if verbosity:
+            self.stdout.write('%s: %d snapshots rebuilt.' % (arg, count))
@@ -0,0 +1,63 @@
+import logging
+
+from . import instrumentation, routers
+from . import settings as feincmstools_settings
+
+logger = logging.getLogger('feincmstools.instrumentation')
+
+
+class InstrumentationMiddleware(object):
+    """
+    Collects content loading and rendering timings for every request, logs a
+    summary to the ``feincmstools.instrumentation`` logger at DEBUG level and,
+    if FEINCMSTOOLS_SERVER_TIMING is set, adds a ``Server-Timing`` header.
+
+    Query counts are only available when Django records queries (DEBUG = True).
+    """
+
+    def process_request(self, request):
+        instrumentation.start_collecting()
+
+    def process_response(self, request, response):
+        collector = instrumentation.stop_collecting()
+        if collector is None:
+            return response
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('%s %s: %s', request.method, request.path,
+                         collector.summary())
+        if feincmstools_settings.SERVER_TIMING:
+            header = collector.server_timing()
+            if header:
+                response['Server-Timing'] = header
+        return response
+
+
+class ReplicaMiddleware(object):
+    """
+    Reads FeinCMS documents and content from FEINCMSTOOLS_READ_REPLICA_ALIAS
+    during ``GET`` and ``HEAD`` requests, except under
+    FEINCMSTOOLS_REPLICA_PRIMARY_PATHS and for clients which wrote recently.
+    See :py:mod:`feincmstools.routers`.
+    """
+    cookie_name = 'feincmstools_primary'
+
+    def process_request(self, request):
+        routers.reset()
+        enabled = (request.method in ('GET', 'HEAD') and
+                   self.cookie_name not in request.COOKIES and
+                   not request.path.startswith(
+                       tuple(feincmstools_settings.REPLICA_PRIMARY_PATHS)))
+        request._feincmstools_replica = routers.using_replica(enabled)
+        request._feincmstools_replica.__enter__()
+
+    def process_response(self, request, response):
+        context = getattr(request, '_feincmstools_replica', None)
+        if context is not None:
+            context.__exit__(None, None, None)
+            del request._feincmstools_replica
+        if routers.wrote():
+            # Replicas may lag behind; let the client see its own writes.
+            response.set_cookie(self.cookie_name, '1',
+                max_age=feincmstools_settings.REPLICA_STICKY_SECONDS)
+            routers.reset()
+        return response
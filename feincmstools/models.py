@@ -1,6 +1,24 @@
 from collections import OrderedDict as SortedDict
 import sys
 
+from . import settings as feincmstools_settings
+
+def add_content_type_index(content_type):
+    """
+    Declares FEINCMSTOOLS_CONTENT_TYPE_INDEX in the ``index_together`` of a
+    generated content type, as its rows are always loaded by parent and
+    region, in order.
+    """
+    fields = tuple(feincmstools_settings.CONTENT_TYPE_INDEX or ())
+    if not fields:
+        return
+    opts = content_type._meta
+    index_together = [tuple(index) for index in opts.index_together]
+    if fields not in index_together:
+        opts.index_together = index_together + [fields]
+        # Seen by the migrations autodetector.
+        opts.original_attrs['index_together'] = opts.index_together
+
 def create_content_types(feincms_model, content_types_by_region_fn):
 
     # retrieve a mapping of content types for each region
@@ -36,6 +54,7 @@ def create_content_types(feincms_model, content_types_by_region_fn):
             optgroup=option_group,
             **kwargs
         )
+        add_content_type_index(new_content_type)
 
         # FeinCMS does not correctly fake the module appearance,
         # and shell_plus becomes subsequently confused.
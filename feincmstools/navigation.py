@@ -0,0 +1,191 @@
+"""
+Navigation trees for HierarchicalFeinCMSDocuments, built from a single
+query and cached until the tree changes.
+
+    from feincmstools.navigation import get_navigation
+
+    for node in get_navigation(Article, current=article, depth=2):
+        print node.title, node.is_active, node.in_path, len(node.children)
+
+Or in a template:
+
+    {% load feincmstools_tags %}
+    {% feincms_navigation feincms_page depth=2 as nav %}
+    {% for node in nav %}
+        <a href="{{ node.get_absolute_url }}"{% if node.in_path %} class="active"{% endif %}>{{ node.title }}</a>
+        ...recurse through node.children...
+    {% endfor %}
+
+Nodes give access to their document's attributes and carry flags relative
+to the ``current`` page, as the ``is_parent_of`` etc. filters would.
+
+Trees are invalidated through a generation counter in the cache, so all
+processes must share the cache. With ``LocMemCache``, which is per process,
+trees are only cached for ``LOCAL_CACHE_TIMEOUT`` seconds.
+"""
+
+from django.core.cache import cache, caches, DEFAULT_CACHE_ALIAS
+from django.core.cache.backends.locmem import LocMemCache
+from django.db.models.signals import post_save, post_delete
+
+from . import settings as feincmstools_settings
+from .snapshots import defer_snapshot
+from .signals import documents_cloned
+from .transactions import after_commit
+
+# Seconds to cache trees for when other processes can't see invalidations.
+LOCAL_CACHE_TIMEOUT = 10
+
+
+class NavigationNode(object):
+    """
+    A document in a navigation tree, with its ``children`` and these flags:
+
+    ``is_active`` -- it is the current page
+    ``is_ancestor`` -- it is an ancestor of the current page
+    ``in_path`` -- either of the above
+    ``is_sibling`` -- it has the same parent as the current page, but isn't it
+    """
+
+    def __init__(self, document):
+        self.document = document
+        self.children = []
+        self.is_active = self.is_ancestor = self.in_path = self.is_sibling = False
+
+    def __getattr__(self, attr):
+        if attr.startswith('__') or attr == 'document':
+            raise AttributeError(attr)
+        return getattr(self.document, attr)
+
+    def __repr__(self):
+        return '<NavigationNode %r>' % self.document
+
+
+def _label(model):
+    opts = model._meta.concrete_model._meta
+    return '%s.%s' % (opts.app_label, opts.object_name.lower())
+
+
+def _generation_key(model):
+    return 'feincmstools:navigation:%s:generation' % _label(model)
+
+
+def _get_generation(model):
+    key = _generation_key(model)
+    cache.add(key, 1, None)
+    return cache.get(key, 1)
+
+
+def _next_generation(model):
+    key = _generation_key(model)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def invalidate_navigation(sender, **kwargs):
+    """
+    Signal receiver which invalidates all cached navigation trees of
+    ``sender``, now and again once the current transaction commits, so that
+    trees built from the old rows in between aren't kept.
+    """
+    _next_generation(sender)
+    after_commit(_next_generation, sender)
+
+
+def connect_invalidation(model):
+    """
+    Invalidate cached navigation for ``model`` whenever one of its documents
+    is saved, deleted or cloned. Called for every concrete
+    HierarchicalFeinCMSDocument and proxy.
+    """
+    post_save.connect(invalidate_navigation, sender=model)
+    post_delete.connect(invalidate_navigation, sender=model)
+    documents_cloned.connect(invalidate_navigation, sender=model)
+
+
+def build_navigation(documents, level=None):
+    """
+    Returns the top level ``NavigationNode``s of ``documents``, which must be
+    in ``tree_id, lft`` order. Top level nodes are those at ``level`` (default:
+    the level of the first document). Documents whose parent isn't in
+    ``documents`` are left out, along with their descendants.
+    """
+    roots = []
+    stack = []
+    for document in documents:
+        if level is None:
+            level = document.level
+        # Pop nodes which don't contain this document.
+        while stack and not (
+                stack[-1].tree_id == document.tree_id and
+                stack[-1].lft < document.lft and
+                stack[-1].rght > document.rght):
+            stack.pop()
+        node = NavigationNode(document)
+        if stack:
+            if stack[-1].pk != document.parent_id:
+                continue
+            stack[-1].children.append(node)
+        elif document.level == level:
+            roots.append(node)
+        else:
+            continue
+        stack.append(node)
+    return roots
+
+
+def _load_navigation(model, root=None, depth=None):
+    # Trees are cached, so keep content snapshots out of them.
+    documents = defer_snapshot(model.get_published()).order_by('tree_id', 'lft')
+    level = 0
+    if root is not None:
+        level = root.level + 1
+        documents = documents.filter(
+            tree_id=root.tree_id, lft__gt=root.lft, rght__lt=root.rght)
+    if depth is not None:
+        documents = documents.filter(level__lt=level + depth)
+    return build_navigation(documents, level)
+
+
+def mark_navigation(nodes, current):
+    """
+    Sets the flags of ``nodes`` and their descendants relative to ``current``.
+    """
+    for node in nodes:
+        node.is_active = node.pk == current.pk
+        node.is_ancestor = (node.tree_id == current.tree_id and
+                            node.lft < current.lft and
+                            node.rght > current.rght)
+        node.in_path = node.is_active or node.is_ancestor
+        node.is_sibling = (not node.is_active and
+                           node.parent_id == current.parent_id)
+        mark_navigation(node.children, current)
+
+
+def get_navigation(model, current=None, root=None, depth=None):
+    """
+    Returns the top level ``NavigationNode``s for the published documents of
+    ``model``: the tree roots, or the children of ``root`` if given, including
+    ``depth`` levels (default: all). Flags are set relative to ``current``.
+
+    Trees are cached for FEINCMSTOOLS_NAVIGATION_CACHE_TIMEOUT seconds, or
+    until a document of ``model`` is saved or deleted.
+    """
+    timeout = feincmstools_settings.NAVIGATION_CACHE_TIMEOUT
+    if timeout and isinstance(caches[DEFAULT_CACHE_ALIAS], LocMemCache):
+        timeout = min(timeout, LOCAL_CACHE_TIMEOUT)
+    nodes = None
+    if timeout:
+        key = 'feincmstools:navigation:%s:%s:%s:%s' % (
+            _label(model), _get_generation(model),
+            root.pk if root is not None else '', depth or '')
+        nodes = cache.get(key)
+    if nodes is None:
+        nodes = _load_navigation(model, root, depth)
+        if timeout:
+            cache.set(key, nodes, timeout)
+    if current is not None:
+        mark_navigation(nodes, current)
+    return nodes
@@ -0,0 +1,288 @@
+"""
+Pre-renders published FeinCMSDocuments to static HTML, so that anonymous
+reads of rarely edited pages can be served without Django.
+
+    from feincmstools.publish import Publisher
+
+    Publisher(mode='both', processes=4).publish(Article)
+
+Or ``manage.py publish_documents magazine.Article --mode=both --processes=4``.
+
+Whole pages are rendered by requesting ``get_absolute_url()`` through the
+project's URLconf, views and middleware, and saved as
+``<url>/index.html``. Regions are rendered with ``render_region()`` and
+saved as ``_regions/<app_label>.<model_name>/<pk>/<region>.html``.
+
+Publishing is incremental: a fingerprint of each document and its content
+rows, including those it inherits from its ancestors, is kept in
+``manifest.json``, and documents whose fingerprint hasn't changed since the
+last run are not rendered again. Changes elsewhere, e.g. to templates or to
+other documents shown on the page, aren't detected; use ``force`` to
+re-render everything. The manifest also maps each published URL
+to its file, for front-end servers.
+"""
+
+import hashlib
+import json
+from multiprocessing import Pool
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, get_storage_class
+from django.core.handlers.base import BaseHandler
+from django.db import connections
+from django.db.models.loading import get_model
+from django.test.client import RequestFactory
+from django.utils.encoding import force_bytes
+
+from . import settings as feincmstools_settings
+
+MANIFEST_NAME = 'manifest.json'
+MODES = ('page', 'regions', 'both')
+
+
+def get_publish_storage(root=None):
+    """
+    Returns the storage to publish to: FEINCMSTOOLS_PUBLISH_STORAGE if set,
+    otherwise the file system at ``root`` or FEINCMSTOOLS_PUBLISH_ROOT.
+    """
+    if root is None and feincmstools_settings.PUBLISH_STORAGE:
+        return get_storage_class(feincmstools_settings.PUBLISH_STORAGE)()
+    root = root or feincmstools_settings.PUBLISH_ROOT
+    if not root:
+        raise ValueError('Set FEINCMSTOOLS_PUBLISH_ROOT or '
+                         'FEINCMSTOOLS_PUBLISH_STORAGE to publish documents.')
+    return FileSystemStorage(location=root)
+
+
+def document_key(document):
+    return '%s.%s:%s' % (document._meta.app_label,
+                         document._meta.object_name.lower(), document.pk)
+
+
+def document_fingerprint(document):
+    """
+    Returns a hash of the document's fields and all of its content rows, and
+    for a HierarchicalFeinCMSDocument, of its ancestors' content in its
+    inherited regions, which changes whenever any of them do.
+    """
+    fingerprint = hashlib.sha1()
+    fingerprint.update(force_bytes(repr([
+        getattr(document, field.attname) for field in document._meta.fields])))
+    inherited = [region.key for region in document.template.regions
+                 if region.inherited]
+    ancestors = []
+    if inherited and hasattr(document, 'get_ancestors'):
+        ancestors = list(document.get_ancestors().values_list('pk', flat=True))
+    for cls in document._feincms_content_types:
+        rows = cls._default_manager.filter(parent=document)\
+            .order_by('pk').values_list()
+        fingerprint.update(force_bytes(repr((cls._meta.db_table, list(rows)))))
+        if ancestors:
+            rows = cls._default_manager.filter(
+                parent__in=ancestors, region__in=inherited,
+            ).order_by('parent', 'pk').values_list()
+            fingerprint.update(force_bytes(repr((cls._meta.db_table,
+                                                 'inherited', list(rows)))))
+    return fingerprint.hexdigest()
+
+
+class Publisher(object):
+    """
+    Renders documents into ``storage`` (see :py:func:`get_publish_storage`).
+
+    ``mode`` is ``'page'``, ``'regions'`` or ``'both'``. With ``processes``
+    greater than 1, documents are rendered by a pool of worker processes.
+    ``force`` re-renders documents which haven't changed.
+    """
+
+    def __init__(self, storage=None, mode='page', processes=1, force=False,
+                 host=None):
+        if mode not in MODES:
+            raise ValueError('mode must be one of %s' % ', '.join(MODES))
+        self.storage = storage or get_publish_storage()
+        self.mode = mode
+        self.processes = processes
+        self.force = force
+        self.host = host or feincmstools_settings.PUBLISH_HOST
+
+    # --- Manifest -------------------------------------------------------------
+
+    def load_manifest(self):
+        if not self.storage.exists(MANIFEST_NAME):
+            return {'documents': {}, 'urls': {}}
+        manifest_file = self.storage.open(MANIFEST_NAME)
+        try:
+            return json.loads(manifest_file.read())
+        finally:
+            manifest_file.close()
+
+    def save_manifest(self, manifest):
+        manifest['urls'] = dict(
+            (entry['url'], entry['files']['page'])
+            for entry in manifest['documents'].values()
+            if entry.get('url') and 'page' in entry['files'])
+        self._save(MANIFEST_NAME, json.dumps(manifest, indent=2, sort_keys=True))
+
+    def _save(self, name, content):
+        """
+        Saves ``content`` as ``name`` and returns the name the storage used,
+        which may differ (e.g. normalized, or made unique).
+        """
+        # Storages pick a new name rather than overwriting an existing file.
+        if self.storage.exists(name):
+            self.storage.delete(name)
+        return self.storage.save(name, ContentFile(force_bytes(content)))
+
+    # --- Rendering ------------------------------------------------------------
+
+    def _request(self, path):
+        request = RequestFactory(SERVER_NAME=self.host).get(path)
+        request.user = AnonymousUser()
+        return request
+
+    def render_page(self, document):
+        """
+        Returns the HTML of the document's page, as served by the project.
+        """
+        handler = BaseHandler()
+        handler.load_middleware()
+        response = handler.get_response(self._request(document.get_absolute_url()))
+        if hasattr(response, 'render') and callable(response.render):
+            response.render()
+        if response.status_code != 200:
+            raise ValueError('%s returned status %d' % (
+                document.get_absolute_url(), response.status_code))
+        return response.content
+
+    def render_regions(self, document):
+        """
+        Returns a dict of the rendered HTML of each of the document's regions.
+        """
+        request = self._request(getattr(document, 'get_absolute_url', lambda: '/')())
+        return dict((region.key, document.render_region(region.key, request))
+                    for region in document.template.regions)
+
+    def publish_document(self, document, fingerprint=None):
+        """
+        Renders and saves the document, returning its manifest entry.
+        """
+        key = document_key(document)
+        entry = {
+            'fingerprint': fingerprint or document_fingerprint(document),
+            'files': {},
+        }
+        if self.mode in ('page', 'both'):
+            entry['url'] = document.get_absolute_url()
+            name = '/'.join(filter(None, [entry['url'].strip('/'), 'index.html']))
+            entry['files']['page'] = self._save(name, self.render_page(document))
+        if self.mode in ('regions', 'both'):
+            entry['files']['regions'] = {}
+            for region, html in self.render_regions(document).items():
+                name = '_regions/%s/%s.html' % (key.replace(':', '/'), region)
+                entry['files']['regions'][region] = self._save(name, html)
+        return entry
+
+    def _files(self, entry):
+        files = list(entry['files'].get('regions', {}).values())
+        if 'page' in entry['files']:
+            files.append(entry['files']['page'])
+        return files
+
+    def unpublish(self, entry, keep=()):
+        """
+        Deletes the files of a manifest ``entry``, except those in ``keep``.
+        """
+        for name in self._files(entry):
+            if name not in keep and self.storage.exists(name):
+                self.storage.delete(name)
+
+    def publish(self, model, queryset=None):
+        """
+        Publishes the documents in ``queryset`` (default:
+        ``model.get_published()``), removes previously published documents of
+        ``model`` which are no longer in it, and updates the manifest.
+
+        Returns a dict counting the documents ``rendered``, ``unchanged``,
+        ``removed`` and ``failed``, with the errors in ``errors``.
+        """
+        if queryset is None:
+            queryset = model.get_published()
+        manifest = self.load_manifest()
+        documents = manifest['documents']
+        label = '%s.%s' % (model._meta.app_label, model._meta.object_name.lower())
+        stats = {'rendered': 0, 'unchanged': 0, 'removed': 0, 'failed': 0,
+                 'errors': {}}
+
+        tasks = []
+        for pk in queryset.values_list('pk', flat=True):
+            key = '%s:%s' % (label, pk)
+            previous = documents.get(key)
+            tasks.append((label, pk, None if self.force or not previous
+                          else previous['fingerprint'], self._options()))
+
+        if self.processes > 1:
+            # Forked workers must not share the parent's connections.
+            for connection in connections.all():
+                connection.close()
+            pool = Pool(self.processes, initializer=_close_connections)
+            try:
+                results = pool.imap_unordered(_publish, tasks)
+                stats = self._collect(results, documents, stats)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            stats = self._collect(map(_publish, tasks), documents, stats)
+
+        published = set('%s:%s' % (label, task[1]) for task in tasks)
+        for key in [k for k in documents if k.startswith(label + ':')]:
+            if key not in published:
+                self.unpublish(documents.pop(key))
+                stats['removed'] += 1
+
+        self.save_manifest(manifest)
+        return stats
+
+    def _collect(self, results, documents, stats):
+        for key, status, result in results:
+            stats[status] += 1
+            if status == 'rendered':
+                if key in documents:
+                    # The storage may have saved the files under new names.
+                    self.unpublish(documents[key], keep=self._files(result))
+                documents[key] = result
+            elif status == 'failed':
+                stats['errors'][key] = result
+        return stats
+
+    def _options(self):
+        return {
+            'storage': self.storage,
+            'mode': self.mode,
+            'host': self.host,
+        }
+
+
+def _close_connections():
+    for connection in connections.all():
+        connection.close()
+
+
+def _publish(task):
+    """
+    Publishes one document, in a worker process or not. Returns a tuple of the
+    document key, status and either its manifest entry or the error.
+    """
+    label, pk, previous_fingerprint, options = task
+    publisher = Publisher(**options)
+    model = get_model(*label.split('.'))
+    key = '%s:%s' % (label, pk)
+    try:
+        document = model._default_manager.get(pk=pk)
+        fingerprint = document_fingerprint(document)
+        if fingerprint == previous_fingerprint:
+            return key, 'unchanged', None
+        return key, 'rendered', publisher.publish_document(document, fingerprint)
+    except Exception as e:
+        return key, 'failed', '%s: %s' % (e.__class__.__name__, e)
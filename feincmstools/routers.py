@@ -0,0 +1,123 @@
+"""
+Sends reads of FeinCMSDocuments and their content to a read replica.
+
+    DATABASES = {
+        'default': {...},
+        'replica': {...},
+    }
+    DATABASE_ROUTERS = ['feincmstools.routers.ReplicaRouter']
+    FEINCMSTOOLS_READ_REPLICA_ALIAS = 'replica'
+    MIDDLEWARE_CLASSES = (
+        'feincmstools.middleware.ReplicaMiddleware',
+        ...
+    )
+
+Reads only go to the replica inside :py:func:`using_replica`, which
+``ReplicaMiddleware`` wraps around ``GET`` and ``HEAD`` requests outside
+FEINCMSTOOLS_REPLICA_PRIMARY_PATHS (the admin). Any other read, any write
+(including saves of instances read from the replica), and every read from
+the start of a write on in the same thread goes to the primary. After
+a request that wrote, the client reads from the primary for
+FEINCMSTOOLS_REPLICA_STICKY_SECONDS, to cover replication lag.
+
+Outside requests, e.g. in management commands:
+
+    with using_replica():
+        html = article.render_region('main', request)
+"""
+
+from contextlib import contextmanager
+import threading
+
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.signals import pre_save, pre_delete
+
+from . import settings as feincmstools_settings
+
+_local = threading.local()
+
+
+def is_feincms_model(model):
+    """ FeinCMS documents and their generated content types. """
+    return (hasattr(model, '_feincms_content_types') or
+            hasattr(model, '_feincms_content_class'))
+
+
+def replica_active():
+    """
+    Returns whether reads in the current thread may go to the replica.
+    """
+    return (getattr(_local, 'replica', False) and
+            not getattr(_local, 'wrote', False) and
+            bool(feincmstools_settings.READ_REPLICA_ALIAS))
+
+
+@contextmanager
+def using_replica(enabled=True):
+    """
+    Sends reads of feincmstools models in the block to the replica, or to
+    the primary if not ``enabled``.
+    """
+    previous = getattr(_local, 'replica', False)
+    _local.replica = enabled
+    try:
+        yield
+    finally:
+        _local.replica = previous
+
+
+def using_primary():
+    """ Sends all reads in the block to the primary. """
+    return using_replica(False)
+
+
+def wrote():
+    """ Returns whether the current thread wrote since :py:func:`reset`. """
+    return getattr(_local, 'wrote', False)
+
+
+def reset():
+    """ Forgets the writes of the current thread, e.g. between requests. """
+    _local.wrote = False
+
+
+def _record_write(sender, **kwargs):
+    _local.wrote = True
+
+
+# Before the write, so that its own signal receivers read from the primary.
+pre_save.connect(_record_write)
+pre_delete.connect(_record_write)
+
+
+class ReplicaRouter(object):
+    """
+    Routes reads of feincmstools models to FEINCMSTOOLS_READ_REPLICA_ALIAS
+    while :py:func:`replica_active`, and their writes to the primary, even
+    for instances read from the replica. Leaves other models to the other
+    routers.
+    """
+
+    def db_for_read(self, model, **hints):
+        if is_feincms_model(model) and replica_active():
+            return feincmstools_settings.READ_REPLICA_ALIAS
+        return None
+
+    def db_for_write(self, model, **hints):
+        if is_feincms_model(model):
+            _local.wrote = True
+            # Otherwise Django writes an instance back to the database it
+            # was read from.
+            return DEFAULT_DB_ALIAS
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary.
+        databases = set([DEFAULT_DB_ALIAS,
+                         feincmstools_settings.READ_REPLICA_ALIAS])
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, *args, **hints):
+        return None
@@ -8,6 +8,21 @@ PREFIX = 'FEINCMSTOOLS_'
 DEFAULT_SETTINGS = {
     'CONTENT_VIEW_CHOICES': (), # e.g. (('My View', 'myapp.views.myview'),)
     'USE_LEGACY_TABLE_NAMES': False, #Set to True for legacy projects.
+    'CACHE_TEMPLATE_PATHS': not settings.DEBUG, # Remember which template each content type/region resolves to.
+    'TIMING_SIGNALS': False, # Set to True to time and send the feincmstools.signals timing signals even without an active collector.
+    'SERVER_TIMING': False, # Set to True to send a Server-Timing header from InstrumentationMiddleware.
+    'PUBLISH_ROOT': None, # Directory that feincmstools.publish writes static HTML to...
+    'PUBLISH_STORAGE': None, # ...or the dotted path of a storage class to use instead.
+    'PUBLISH_HOST': 'localhost', # Host name used in requests for published pages. Must be in ALLOWED_HOSTS.
+    'NAVIGATION_CACHE_TIMEOUT': 3600, # Seconds to cache navigation trees for, 0 to disable. Saving a document invalidates them.
+    'CONTENT_TYPE_INDEX': ('parent', 'region', 'ordering'), # Composite index declared on generated content type tables, () for none.
+    'READ_REPLICA_ALIAS': None, # Database alias that ReplicaRouter sends document and content reads to.
+    'REPLICA_PRIMARY_PATHS': ('/admin/',), # Path prefixes which always read from the primary.
+    'REPLICA_STICKY_SECONDS': 10, # How long a client reads from the primary after writing.
+    'RENDER_FALLBACK_TIMEOUT': 86400, # Seconds to keep the last good rendering of content types with a render_budget.
+    'CONTENT_VERSION_TIMEOUT': 86400, # Seconds to keep content versions for. Needs a shared cache.
+    'CONTENT_USAGE_TIMEOUT': 0, # Seconds to cache which content types have rows in which regions, 0 to always query all. Needs a shared cache.
+    'EXTRA_CONTEXT_THREADS': 8, # Maximum threads used to fetch concurrent_extra_context per region, 1 to disable.
 }
 
 def prefixed(string):
@@ -0,0 +1,57 @@
+"""
+Signals sent by feincmstools while loading and rendering content.
+
+Every signal is sent with the relevant model class as ``sender``, and the
+timing arguments are always present:
+
+    duration -- wall time, in seconds
+    queries -- number of SQL queries run, on all database connections
+               (only counted when Django records queries, i.e. DEBUG = True)
+
+``content_rendered``, ``template_resolved``, ``content_loaded`` and
+``search_text_rendered`` are only sent while a collector of
+:py:mod:`feincmstools.instrumentation` is active in the current thread, or
+always if FEINCMSTOOLS_TIMING_SIGNALS is set.
+
+See :py:mod:`feincmstools.instrumentation` for a per-request collector which
+listens to these signals.
+"""
+
+from django.dispatch import Signal
+
+#: Sent by ``Content.render`` once a content item has been rendered.
+#: ``sender`` is the concrete content type class.
+content_rendered = Signal(providing_args=[
+    'instance', 'region', 'template', 'duration', 'queries'])
+
+#: Sent whenever a content type looks up its render or admin template.
+#: ``sender`` is the concrete content type class, ``probes`` the number of
+#: template paths tried and ``cache_hit`` whether the answer came from the
+#: template path cache.
+template_resolved = Signal(providing_args=[
+    'region', 'template', 'probes', 'cache_hit', 'duration', 'queries'])
+
+#: Sent by the content proxy of a ``FeinCMSDocument`` after loading from the
+#: database. ``sender`` is the document class, ``stage`` is ``'counts'`` when
+#: the regions in use are determined, ``'contents'`` when the content
+#: items themselves are fetched and ``'snapshot'`` when they are hydrated
+#: from a content snapshot.
+content_loaded = Signal(providing_args=[
+    'document', 'stage', 'duration', 'queries'])
+
+#: Sent by ``FeinCMSDocument.search_text``. ``sender`` is the document class.
+search_text_rendered = Signal(providing_args=[
+    'document', 'duration', 'queries'])
+
+#: Sent by :py:mod:`feincmstools.budgets` when a content item with a
+#: ``render_budget`` fails to render, renders over budget, or isn't rendered
+#: because its type's circuit breaker is open. ``sender`` is the concrete
+#: content type class, ``reason`` is ``'error'``, ``'slow'`` or ``'open'``.
+render_degraded = Signal(providing_args=[
+    'instance', 'region', 'reason', 'duration'])
+
+#: Sent by :py:mod:`feincmstools.cloning` once documents have been copied in
+#: bulk, as no ``post_save`` signals are sent for the copies or their content.
+#: ``sender`` is the document class, ``originals`` and ``copies`` are lists of
+#: documents in the same order.
+documents_cloned = Signal(providing_args=['originals', 'copies'])
@@ -0,0 +1,146 @@
+"""
+Streams the URLs of HierarchicalFeinCMSDocuments, for sitemaps and URL
+lists, without calling ``get_path()`` (and so ``get_ancestors()``) per node.
+
+    from feincmstools.sitemaps import iter_paths, write_sitemaps
+
+    for path, values in iter_paths(Article):
+        print path                  # as article.get_path() would return
+
+    write_sitemaps(Article, storage, 'http://example.com')
+
+Or ``manage.py export_urls magazine.Article`` to print the URLs, and
+``manage.py export_urls magazine.Article --sitemap`` to write a sitemap index
+and sitemap files to FEINCMSTOOLS_PUBLISH_ROOT or FEINCMSTOOLS_PUBLISH_STORAGE.
+
+The table is read once, in ``tree_id, lft`` order and in chunks of
+``CHUNK_SIZE`` rows (keyset paginated, so that no backend loads the whole
+result at once), and paths are built from a stack of ancestor slugs. Memory
+use doesn't grow with the number of documents.
+"""
+
+import tempfile
+from xml.sax.saxutils import escape
+
+from django.core.files import File
+from django.db.models import Q
+
+CHUNK_SIZE = 2000
+# Per the sitemaps.org protocol.
+URLS_PER_SITEMAP = 50000
+
+SITEMAP_HEADER = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+                  '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n')
+SITEMAP_FOOTER = '</urlset>\n'
+INDEX_HEADER = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n')
+INDEX_FOOTER = '</sitemapindex>\n'
+
+
+def _iter_rows(queryset, fields, chunk_size):
+    queryset = queryset.order_by('tree_id', 'lft').values_list(
+        'tree_id', 'lft', *fields)
+    position = None
+    while True:
+        chunk = queryset
+        if position is not None:
+            tree_id, lft = position
+            chunk = chunk.filter(Q(tree_id__gt=tree_id) |
+                                 Q(tree_id=tree_id, lft__gt=lft))
+        rows = list(chunk[:chunk_size])
+        for row in rows:
+            yield row[2:]
+        if len(rows) < chunk_size:
+            return
+        position = rows[-1][:2]
+
+
+def iter_paths(model, queryset=None, fields=(), chunk_size=CHUNK_SIZE):
+    """
+    Yields ``(path, values)`` for every document in ``queryset`` (default:
+    ``model.get_published()``) in tree order, where ``path`` is what
+    ``get_path()`` would return and ``values`` is a dict of the extra
+    ``fields``. Documents whose parent isn't in ``queryset`` are left out,
+    along with their descendants.
+    """
+    if queryset is None:
+        queryset = model.get_published()
+    fields = tuple(fields)
+    stack = [] # (pk, slug) of the ancestors of the current row
+    for row in _iter_rows(queryset, ('pk', 'parent_id', 'level', 'slug') + fields,
+                          chunk_size):
+        pk, parent_id, level, slug = row[:4]
+        del stack[level:]
+        if level and (len(stack) != level or stack[-1][0] != parent_id):
+            continue # an ancestor was filtered out
+        stack.append((pk, slug))
+        yield '/'.join(s for p, s in stack), dict(zip(fields, row[4:]))
+
+
+def default_url(path):
+    return '/%s/' % path
+
+
+def iter_urls(model, base_url='', url=default_url, lastmod_field=None,
+              queryset=None):
+    """
+    Yields ``(url, lastmod)`` for every document, where ``url`` is
+    ``base_url`` + ``url(path)`` and ``lastmod`` is the value of
+    ``lastmod_field``, or ``None``.
+    """
+    fields = (lastmod_field,) if lastmod_field else ()
+    for path, values in iter_paths(model, queryset, fields):
+        yield base_url.rstrip('/') + url(path), values.get(lastmod_field)
+
+
+def _url_entry(location, lastmod=None):
+    entry = '<loc>%s</loc>' % escape(location)
+    if lastmod is not None:
+        entry += '<lastmod>%s</lastmod>' % lastmod.isoformat()
+    return entry
+
+
+def _save(storage, name, tmp):
+    tmp.seek(0)
+    if storage.exists(name):
+        storage.delete(name)
+    storage.save(name, File(tmp, name))
+    tmp.close()
+
+
+def write_sitemaps(model, storage, base_url, url=default_url,
+                   lastmod_field=None, queryset=None, prefix='sitemap',
+                   urls_per_sitemap=URLS_PER_SITEMAP):
+    """
+    Writes the documents' URLs to ``storage`` as ``<prefix>-1.xml``,
+    ``<prefix>-2.xml`` etc. with at most ``urls_per_sitemap`` URLs each, and
+    a sitemap index listing them as ``<prefix>.xml``. Files are spooled to
+    disk, not built in memory. Returns the number of URLs written.
+    """
+    count = 0
+    names = []
+    sitemap = None
+    for location, lastmod in iter_urls(model, base_url, url, lastmod_field,
+                                       queryset):
+        if count % urls_per_sitemap == 0:
+            if sitemap is not None:
+                sitemap.write(SITEMAP_FOOTER)
+                _save(storage, names[-1], sitemap)
+            names.append('%s-%d.xml' % (prefix, len(names) + 1))
+            sitemap = tempfile.TemporaryFile()
+            sitemap.write(SITEMAP_HEADER)
+        sitemap.write(('<url>%s</url>\n' % _url_entry(location, lastmod))
+                      .encode('utf-8'))
+        count += 1
+    if sitemap is not None:
+        sitemap.write(SITEMAP_FOOTER)
+        _save(storage, names[-1], sitemap)
+
+    index = tempfile.TemporaryFile()
+    index.write(INDEX_HEADER)
+    for name in names:
+        index.write(('<sitemap>%s</sitemap>\n' % _url_entry(
+            '%s/%s' % (base_url.rstrip('/'), name))).encode('utf-8'))
+    index.write(INDEX_FOOTER)
+    _save(storage, '%s.xml' % prefix, index)
+    return count
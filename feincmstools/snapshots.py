@@ -0,0 +1,216 @@
+"""
+Denormalized content snapshots: all the content of a document, serialized
+into a column of the document itself, so that pages can be rendered without
+querying any content type table.
+
+    from feincmstools.snapshots import ContentSnapshot
+
+    class Article(FeinCMSDocument, ContentSnapshot):
+        ...
+
+Then ``makemigrations``, and ``manage.py rebuild_snapshots app.Article`` to
+fill in the snapshots of existing documents.
+
+The snapshot is rebuilt whenever the document or any of its content is saved
+or deleted, and when documents are cloned. Rebuilding costs one query per
+content type, so ``FeinCMSDocumentAdmin`` defers it to once per admin save
+(see :py:func:`deferred_snapshots`). Content changed without signals
+(``QuerySet.update()``, ``bulk_create()``) must be followed by
+:py:func:`rebuild_snapshot`.
+
+``document.content`` hydrates content instances from the snapshot. It falls
+back to querying the tables when the snapshot is empty, or was written for
+content types or fields that have changed since.
+
+Snapshots can be large, so querysets which load many documents without
+rendering their content leave the column out with :py:func:`defer_snapshot`:
+``get_published()``, navigation trees and the admin changelist.
+"""
+
+from contextlib import contextmanager
+import json
+import threading
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, router
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.utils.translation import ugettext_lazy as _
+
+from .signals import documents_cloned
+
+FORMAT = 1
+
+_local = threading.local()
+
+
+class ContentSnapshot(models.Model):
+    """
+    Mixin for FeinCMSDocuments which keeps a snapshot of all their content.
+    """
+    content_snapshot = models.TextField(_('content snapshot'), blank=True,
+                                        default='', editable=False)
+
+    class Meta:
+        abstract = True
+
+
+def defer_snapshot(queryset):
+    """
+    Returns ``queryset`` without the ``content_snapshot`` column, if its
+    model has one. Its documents load the snapshot with a query of its own
+    when their content is accessed.
+    """
+    if issubclass(queryset.model, ContentSnapshot):
+        return queryset.defer('content_snapshot')
+    return queryset
+
+
+def _attnames(content_type):
+    return [field.attname for field in content_type._meta.concrete_fields]
+
+
+def dump_snapshot(model, pk, using=None):
+    """
+    Returns the snapshot of the content of the ``model`` document ``pk``, as
+    compact JSON: the fields of each content type and, for each region, the
+    ``[content type name, [values]]`` of its content in order.
+    """
+    types = {}
+    regions = {}
+    for content_type in model._feincms_content_types:
+        attnames = _attnames(content_type)
+        ordering = attnames.index('ordering')
+        rows = content_type._default_manager.using(using).filter(parent=pk)\
+            .values_list(*attnames)
+        for row in rows:
+            types[content_type.__name__] = attnames
+            regions.setdefault(row[attnames.index('region')], []).append(
+                (row[ordering], content_type.__name__, list(row)))
+    for region, contents in regions.items():
+        regions[region] = [[name, row] for order, name, row in sorted(
+            contents, key=lambda content: content[0])]
+    return json.dumps({'format': FORMAT, 'types': types, 'regions': regions},
+                      cls=DjangoJSONEncoder, separators=(',', ':'))
+
+
+def load_snapshot(model, snapshot, using):
+    """
+    Returns ``{region: [content instances]}`` from a ``snapshot`` of a
+    ``model`` document, or ``None`` if it is empty or out of date.
+    """
+    if not snapshot:
+        return None
+    data = json.loads(snapshot)
+    if data.get('format') != FORMAT:
+        return None
+    content_types = dict((content_type.__name__, content_type)
+                         for content_type in model._feincms_content_types)
+    fields = {}
+    for name, attnames in data['types'].items():
+        content_type = content_types.get(name)
+        if content_type is None or _attnames(content_type) != attnames:
+            return None
+        fields[name] = content_type._meta.concrete_fields
+    regions = {}
+    for region, contents in data['regions'].items():
+        regions[region] = [
+            content_types[name].from_db(using, data['types'][name], [
+                field.to_python(value)
+                for field, value in zip(fields[name], values)])
+            for name, values in contents]
+    return regions
+
+
+def rebuild_snapshot(model, pk, document=None):
+    """
+    Rebuilds and saves the snapshot of the ``model`` document ``pk``, also
+    setting it on ``document`` if given. Sends no signals.
+    """
+    # Read from the database the snapshot is written to, not a replica which
+    # may not have the change yet.
+    snapshot = dump_snapshot(model, pk, using=router.db_for_write(model))
+    model._default_manager.filter(pk=pk).update(content_snapshot=snapshot)
+    if document is not None:
+        document.content_snapshot = snapshot
+
+
+def schedule_rebuild(model, pk, document=None):
+    """
+    Rebuilds the snapshot now, or at the end of the current
+    :py:func:`deferred_snapshots` block. Does nothing for models without
+    snapshots.
+    """
+    if pk is None or not issubclass(model, ContentSnapshot):
+        return
+    model = model._meta.concrete_model
+    if (model, pk) in getattr(_local, 'deleting', ()):
+        return
+    pending = getattr(_local, 'pending', None)
+    if pending is None:
+        rebuild_snapshot(model, pk, document)
+    else:
+        if document is not None or (model, pk) not in pending:
+            pending[(model, pk)] = document
+
+
+@contextmanager
+def deferred_snapshots():
+    """
+    Rebuilds each snapshot which would be rebuilt in the block only once,
+    at the end. Nothing is rebuilt if the block raises.
+    """
+    if getattr(_local, 'pending', None) is not None:
+        yield # nested
+        return
+    _local.pending = {}
+    try:
+        yield
+        pending = _local.pending
+    finally:
+        _local.pending = None
+    for (model, pk), document in pending.items():
+        rebuild_snapshot(model, pk, document)
+
+
+def document_saved(sender, instance, **kwargs):
+    schedule_rebuild(sender, instance.pk, instance)
+
+
+def documents_copied(sender, copies, **kwargs):
+    for copy in copies:
+        schedule_rebuild(sender, copy.pk, copy)
+
+
+def document_deleting(sender, instance, **kwargs):
+    # Don't rebuild while the document's content is deleted along with it.
+    if not hasattr(_local, 'deleting'):
+        _local.deleting = set()
+    _local.deleting.add((sender._meta.concrete_model, instance.pk))
+
+
+def document_deleted(sender, instance, **kwargs):
+    getattr(_local, 'deleting', set()).discard(
+        (sender._meta.concrete_model, instance.pk))
+
+
+def content_changed(sender, instance, **kwargs):
+    model = sender._feincms_content_class
+    parent_cache = sender._meta.get_field('parent').get_cache_name()
+    document = getattr(instance, parent_cache, None)
+    schedule_rebuild(model, instance.parent_id, document)
+
+
+def connect_snapshots(model):
+    """
+    Keep the snapshots of a ``model`` with :py:class:`ContentSnapshot` up to
+    date. Called for every concrete FeinCMSDocument and proxy.
+    """
+    if not issubclass(model, ContentSnapshot):
+        return
+    post_save.connect(document_saved, sender=model)
+    pre_delete.connect(document_deleting, sender=model)
+    post_delete.connect(document_deleted, sender=model)
+    documents_cloned.connect(documents_copied, sender=model)
+    for content_type in model._feincms_content_types:
+        post_save.connect(content_changed, sender=content_type)
+        post_delete.connect(content_changed, sender=content_type)
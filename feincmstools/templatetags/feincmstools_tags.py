@@ -2,7 +2,10 @@ import os
 
 from django import template
 
-from feincms.templatetags.feincms_tags import feincms_render_content
+from feincms.templatetags import feincms_tags
+
+from feincmstools.base import FeinCMSDocument, HierarchicalFeinCMSDocument
+from feincmstools.navigation import get_navigation
 
 register = template.Library()
 
@@ -50,4 +53,49 @@ def get_extension(filename):
 
 @register.assignment_tag(takes_context=True)
 def feincms_render_content_as(context, content, request=None):
-    return feincms_render_content(context, content, request)
+    return feincms_tags.feincms_render_content(context, content, request)
+
+
+@register.simple_tag(takes_context=True)
+def feincms_render_region(context, feincms_object, region, request=None):
+    """
+    Replaces FeinCMS's feincms_render_region when loaded after feincms_tags,
+    so that the extra_context of content types with concurrent_extra_context
+    is fetched in threads. See FeinCMSDocument.render_region.
+
+    {% load feincms_tags feincmstools_tags %}
+    {% feincms_render_region feincms_page "main" request %}
+    """
+    if not isinstance(feincms_object, FeinCMSDocument):
+        return feincms_tags.feincms_render_region(
+            context, feincms_object, region, request)
+    return feincms_object.render_region(region, request, context)
+
+
+@register.simple_tag(takes_context=True)
+def feincms_render_region_values(context, feincms_object, region, request=None):
+    """
+    Like feincms_render_region, but renders content types that allow it from
+    read-only rows rather than model instances. See FeinCMSDocument.content_rows.
+
+    {% feincms_render_region_values feincms_page "main" request %}
+    """
+    if not feincms_object:
+        return ''
+    return feincms_object.render_region(region, request, context,
+                                        values_only=True)
+
+
+@register.assignment_tag
+def feincms_navigation(page, depth=None, root=None):
+    """
+    Loads the navigation tree of the page's model in one (cached) query, with
+    flags relative to the page already set. See feincmstools.navigation.
+
+    {% feincms_navigation feincms_page depth=2 as nav %}
+    {% feincms_navigation feincms_page root=section as subnav %}
+    """
+    if not page or not isinstance(page, HierarchicalFeinCMSDocument):
+        return []
+    return get_navigation(page._meta.concrete_model, current=page, root=root,
+                          depth=depth)
@@ -0,0 +1,60 @@
+"""
+Repeats cache invalidation once the transaction that caused it commits.
+
+Signal receivers run inside the transaction of the write. A request that
+reads in between sees the old rows and can cache them again under the new
+version or generation, where they would stay until they expire. So receivers
+invalidate straight away, and again with :py:func:`after_commit`.
+
+They run at the end of the enclosing :py:func:`commit_hooks` block, which
+``FeinCMSDocumentAdmin`` wraps around its views, once per function and
+arguments however many writes asked for them. Outside such a block, Django
+>= 1.9 runs each of them with ``transaction.on_commit()``; on older
+versions, writes in other transactions only get the first invalidation.
+Wrap code which saves many documents or content items in
+:py:func:`commit_hooks`.
+"""
+
+from contextlib import contextmanager
+import threading
+
+from django.db import transaction
+
+_local = threading.local()
+
+
+def after_commit(func, *args):
+    """
+    Calls ``func(*args)`` once the current transaction commits, or right away
+    outside transactions. Inside a :py:func:`commit_hooks` block, repeated
+    calls with the same arguments run once; with ``transaction.on_commit()``
+    alone, each call runs.
+    """
+    if not transaction.get_connection().in_atomic_block:
+        func(*args)
+        return
+    hooks = getattr(_local, 'hooks', None)
+    if hooks is not None:
+        if (func, args) not in hooks:
+            hooks.append((func, args))
+    elif hasattr(transaction, 'on_commit'):
+        transaction.on_commit(lambda: func(*args))
+
+
+@contextmanager
+def commit_hooks():
+    """
+    Runs the :py:func:`after_commit` calls made in the block at its end,
+    which must be outside any transaction. Nothing runs if the block raises.
+    """
+    if getattr(_local, 'hooks', None) is not None:
+        yield # nested
+        return
+    _local.hooks = []
+    try:
+        yield
+        hooks = _local.hooks
+    finally:
+        _local.hooks = None
+    for func, args in hooks:
+        func(*args)
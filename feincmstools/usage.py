@@ -0,0 +1,100 @@
+"""
+Which content types are actually used, in which regions, per document class.
+
+``get_used_content_types()`` reports what is registered. This module counts
+what has rows, with one aggregate query per content type, and keeps the
+result in the cache as a usage index. Content proxies use the index to leave
+content types and regions which have no rows at all out of their queries.
+
+The index is off unless FEINCMSTOOLS_CONTENT_USAGE_TIMEOUT is set, and needs
+a cache shared by all processes (not ``LocMemCache``), or other processes
+would keep leaving out newly used tables. It is only built by
+``manage.py content_type_usage`` and after content is saved, never while
+serving a page: without it, every table is queried. Saving content in a
+region its type wasn't used in yet discards the index, and rebuilds it once
+the transaction commits. Content created without signals (``bulk_create()``,
+``update()``) must be followed by :py:func:`invalidate_usage`.
+"""
+
+from django.core.cache import cache
+from django.db.models import Count
+from django.db.models.signals import post_save
+
+from . import settings as feincmstools_settings
+from .transactions import after_commit
+
+
+def _usage_key(model):
+    opts = model._meta.concrete_model._meta
+    return 'feincmstools:usage:%s.%s' % (opts.app_label, opts.object_name.lower())
+
+
+def count_usage(model, using=None):
+    """
+    Returns ``{(content type name, region): number of rows}`` for the content
+    types of ``model``, leaving out those without rows.
+    """
+    counts = {}
+    for content_type in model._feincms_content_types:
+        rows = content_type._default_manager.using(using).order_by()\
+            .values_list('region').annotate(count=Count('pk'))
+        for region, count in rows:
+            counts[(content_type.__name__, region)] = count
+    return counts
+
+
+def refresh_usage(model, counts=None):
+    """
+    Rebuilds and caches the usage index of ``model``, from ``counts`` if
+    given, and returns it.
+    """
+    index = {}
+    for name, region in (counts if counts is not None else count_usage(model)):
+        index.setdefault(name, set()).add(region)
+    if feincmstools_settings.CONTENT_USAGE_TIMEOUT:
+        cache.set(_usage_key(model), index,
+                  feincmstools_settings.CONTENT_USAGE_TIMEOUT)
+    return index
+
+
+def get_usage_index(model):
+    """
+    Returns ``{content type name: set of regions with rows}`` for ``model``,
+    or ``None`` if the usage index is turned off or not built.
+    """
+    if not feincmstools_settings.CONTENT_USAGE_TIMEOUT:
+        return None
+    return cache.get(_usage_key(model))
+
+
+def invalidate_usage(model):
+    cache.delete(_usage_key(model))
+
+
+def record_usage(model, content_type, regions):
+    """
+    Discards the usage index of ``model`` if ``content_type`` isn't known to
+    be used in all of ``regions``, and rebuilds it (or builds a missing one)
+    once the transaction commits. Each save in a transaction asks for the
+    rebuild; inside :py:func:`~feincmstools.transactions.commit_hooks`, it
+    only runs once.
+    """
+    if not feincmstools_settings.CONTENT_USAGE_TIMEOUT:
+        return
+    index = cache.get(_usage_key(model))
+    if index is None or not set(regions) <= index.get(content_type.__name__, set()):
+        invalidate_usage(model)
+        after_commit(refresh_usage, model)
+
+
+def content_saved(sender, instance, **kwargs):
+    record_usage(sender._feincms_content_class, sender, [instance.region])
+
+
+def connect_usage(model):
+    """
+    Keep the usage index of ``model`` up to date when content is saved.
+    Called for every concrete FeinCMSDocument and proxy.
+    """
+    for content_type in model._feincms_content_types:
+        post_save.connect(content_saved, sender=content_type)
@@ -0,0 +1,138 @@
+"""
+Cheap content versions for FeinCMSDocuments, for conditional GETs.
+
+Every document has a version -- a random token and the time it was last
+changed -- which is kept in the cache and replaced whenever the document,
+or any of its content, is saved, deleted or cloned. Views can turn it into
+``ETag`` and ``Last-Modified`` headers, and answer revalidations with
+``304 Not Modified`` without loading content or rendering anything:
+
+    from feincmstools.versioning import document_condition
+
+    @document_condition(lambda request, slug: Article.objects.filter(slug=slug).first())
+    def article_detail(request, slug):
+        ...
+
+Versions are kept for FEINCMSTOOLS_CONTENT_VERSION_TIMEOUT seconds, in a
+cache which must be shared by all processes (not ``LocMemCache``). They are
+replaced again once the transaction of the change commits (see
+:py:mod:`feincmstools.transactions`), so that a page rendered from the old
+rows in between isn't kept under the new version.
+
+Versions only track the database. Templates, and anything else the page
+depends on, aren't covered, so clear the cache when deploying changes to
+them. Content changed without signals (``QuerySet.update()``,
+``bulk_create()``) must be followed by :py:func:`bump_version`.
+"""
+
+import hashlib
+import uuid
+
+from django.core.cache import cache
+from django.db.models.signals import post_save, post_delete
+from django.views.decorators.http import condition
+from django.utils import timezone
+
+from . import settings as feincmstools_settings
+from .signals import documents_cloned
+from .transactions import after_commit
+
+
+def _version_key(model, pk):
+    opts = model._meta.concrete_model._meta
+    return 'feincmstools:version:%s.%s:%s' % (
+        opts.app_label, opts.object_name.lower(), pk)
+
+
+def _new_version():
+    return uuid.uuid4().hex, timezone.now()
+
+
+def get_version(model, pks):
+    """
+    Returns the ``(token, last_modified)`` version of the ``model`` documents
+    with primary keys ``pks``, combined if there are several. Documents
+    without a version in the cache get a new one.
+    """
+    keys = [_version_key(model, pk) for pk in pks]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _new_version(),
+                      feincmstools_settings.CONTENT_VERSION_TIMEOUT)
+            versions[key] = cache.get(key) or _new_version()
+    if len(keys) == 1:
+        return versions[keys[0]]
+    token = hashlib.sha1(':'.join(versions[key][0] for key in keys)).hexdigest()
+    return token, max(versions[key][1] for key in keys)
+
+
+def _set_versions(model, pks):
+    cache.set_many(dict((_version_key(model, pk), _new_version())
+                        for pk in pks),
+                   feincmstools_settings.CONTENT_VERSION_TIMEOUT)
+
+
+def bump_version(model, pks):
+    """
+    Gives the ``model`` documents with primary keys ``pks`` new versions,
+    now and again once the current transaction commits.
+    """
+    pks = tuple(pks)
+    _set_versions(model, pks)
+    after_commit(_set_versions, model, pks)
+
+
+def document_changed(sender, instance, **kwargs):
+    bump_version(sender, [instance.pk])
+
+
+def documents_copied(sender, copies, **kwargs):
+    bump_version(sender, [copy.pk for copy in copies])
+
+
+def content_changed(sender, instance, **kwargs):
+    if instance.parent_id is not None:
+        bump_version(sender._feincms_content_class, [instance.parent_id])
+
+
+def connect_versioning(model):
+    """
+    Bump the version of a ``model`` document whenever it or its content is
+    saved, deleted or cloned. Called for every concrete FeinCMSDocument and
+    proxy.
+    """
+    post_save.connect(document_changed, sender=model)
+    post_delete.connect(document_changed, sender=model)
+    documents_cloned.connect(documents_copied, sender=model)
+    for content_type in model._feincms_content_types:
+        post_save.connect(content_changed, sender=content_type)
+        post_delete.connect(content_changed, sender=content_type)
+
+
+def document_condition(get_document):
+    """
+    View decorator which sets ``ETag`` and ``Last-Modified`` from the content
+    version of the document returned by ``get_document(request, *args,
+    **kwargs)``, and returns ``304 Not Modified`` when the client's copy is
+    current. If ``get_document`` returns ``None``, the view runs as usual.
+
+    Only use it for views whose output depends on nothing but the document,
+    e.g. not on the user.
+    """
+    def get_document_version(request, *args, **kwargs):
+        if not hasattr(request, '_feincmstools_version'):
+            document = get_document(request, *args, **kwargs)
+            request._feincmstools_version = (
+                document.get_content_version() if document is not None else None)
+        return request._feincmstools_version
+
+    def etag(request, *args, **kwargs):
+        version = get_document_version(request, *args, **kwargs)
+        return version and version[0]
+
+    def last_modified(request, *args, **kwargs):
+        version = get_document_version(request, *args, **kwargs)
+        return version and version[1]
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
@@ -15,7 +15,7 @@ setuptools.setup(
     url='https://github.com/ixc/glamkit-feincmstools',
     long_description=locals().get('long_description', ''),
     license='BSD',
-    packages=setuptools.find_packages(),
+    packages=setuptools.find_packages(exclude=['benchmarks', 'benchmarks.*']),
     include_package_data=True,
     setup_requires=['setuptools_scm'],
     classifiers=[